@@ -13,6 +13,14 @@ from flask_migrate import Migrate
 from flask_session import Session
 from flask_wtf.csrf import CSRFProtect
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app.ingest import ActivityBuffer
+from app.limiter import AdmissionController
+from app.profiler import RequestProfiler
+from app.pubsub import EntryEventBroker
+from app.sentiment import SentimentCache
+from app.tokens import TokenAuth
 
 # Load environment variables
 load_dotenv()
@@ -23,6 +31,12 @@ login_manager = LoginManager()
 csrf = CSRFProtect()
 migrate = Migrate()
 sess = Session()
+limiter = AdmissionController()
+sentiment_cache = SentimentCache()
+entry_events = EntryEventBroker()
+activity_buffer = ActivityBuffer()
+token_auth = TokenAuth()
+profiler = RequestProfiler()
 
 def create_app():
     """Create and configure the Flask application"""
@@ -35,13 +49,46 @@ def create_app():
     app.config['SESSION_TYPE'] = 'filesystem'
     app.config['SESSION_PERMANENT'] = False
     app.config['PERMANENT_SESSION_LIFETIME'] = 1800  # 30 minutes
+    app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('RATELIMIT_STORAGE_URL')  # e.g. redis://localhost:6379/0
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))  # reverse proxies in front of the app whose X-Forwarded-* headers are trusted
+    app.config['METRICS_ALLOWED_IPS'] = {ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()}  # scrapers allowed to read /metrics (admins always are)
+    app.config['SENTIMENT_CACHE_PATH'] = os.environ.get('SENTIMENT_CACHE_PATH')  # optional on-disk cache
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))  # age at which entries are archived
+    app.config['SYNC_TOMBSTONE_DAYS'] = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 90))  # sync tokens older than this must do a full sync
+    app.config['PUBSUB_URL'] = os.environ.get('PUBSUB_URL')  # e.g. redis://localhost:6379/1 with several workers
+    app.config['STREAM_MAX_OPEN'] = int(os.environ.get('STREAM_MAX_OPEN', 1))  # live streams per sync worker, each holds a thread
+    app.config['ACTIVITY_FLUSH_INTERVAL'] = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 2.0))  # seconds between bulk inserts
+    app.config['ADMIN_USERNAMES'] = {name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()}  # users allowed into admin views, none unless configured
+    app.config['ANALYTICS_SNAPSHOT_DIR'] = os.environ.get('ANALYTICS_SNAPSHOT_DIR')  # defaults to instance/analytics
+    app.config['ACCESS_TOKEN_TTL'] = int(os.environ.get('ACCESS_TOKEN_TTL', 900))  # seconds an API access token is valid
+    app.config['REFRESH_TOKEN_TTL'] = int(os.environ.get('REFRESH_TOKEN_TTL', 30 * 24 * 3600))  # seconds a refresh token is valid
+    app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED', '').lower() in ('1', 'true', 'yes')  # allow request profiling
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))  # fraction of requests profiled at random
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')  # defaults to instance/profiles
+    app.config['PROVISION_API_MAX_ROWS'] = int(os.environ.get('PROVISION_API_MAX_ROWS', 200))  # hashed within the worker timeout; larger imports go through the CLI
+    app.config['PROVISION_WORKERS'] = max(1, int(os.environ.get('PROVISION_WORKERS', 2)))  # hashing processes kept per worker for API uploads
+    
+    # Behind a reverse proxy the client address (per-client rate limits, the
+    # /metrics allow-list) comes from the headers the proxies set
+    if app.config['TRUSTED_PROXIES']:
+        proxies = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
     
     # Initialize extensions with the app
     db.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
-    migrate.init_app(app, db)
+    # One transaction per migration so online index builds can step outside it
+    migrate.init_app(app, db, transaction_per_migration=True)
     sess.init_app(app)
+    limiter.init_app(app)
+    sentiment_cache.init_app(app)
+    entry_events.init_app(app)
+    activity_buffer.init_app(app)
+    # After the session and CSRF extensions: it wraps the session interface and takes over CSRF checks
+    token_auth.init_app(app)
+    # Last, so admins authenticated by a bearer token can ask for a profile
+    profiler.init_app(app)
     
     # Set up login configuration
     login_manager.login_view = 'auth.login'
@@ -82,6 +129,12 @@ def create_app():
     from app.routes.games import games as games_blueprint
     app.register_blueprint(games_blueprint)
     
+    from app.routes.sync import sync as sync_blueprint
+    app.register_blueprint(sync_blueprint)
+    
+    from app.routes.admin import admin as admin_blueprint
+    app.register_blueprint(admin_blueprint)
+    
     # Register error handlers
     @app.errorhandler(404)
     def page_not_found(e):
@@ -96,4 +149,8 @@ def create_app():
 # Import models to ensure they are registered with SQLAlchemy
 from app.models.user import User
 from app.models.entry import Entry
+from app.models.entry_change import EntryChange
+from app.models.entry_archive import EntryArchive
+from app.models.activity_event import ActivityEvent
+from app.models.revoked_token import RevokedToken
 from app.models.subscription import Subscription
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""
+Population-level mood analytics for the Serene application
+Journal entries are exported incrementally into append-only columnar files,
+one small fixed-width file per column, outside the application database.
+Aggregates across all users are computed over memory-mapped copies of those
+files with vectorized numpy scans, so admin reports never load the entries table
+"""
+import fcntl
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, or_
+
+from app import db
+from app.archive import decompress_block
+from app.models.entry import Entry
+from app.models.entry_archive import EntryArchive
+
+SNAPSHOT_FORMAT = 1
+
+# Code 0 is reserved for values outside the known set (or missing)
+MOODS = ('Happy', 'Neutral', 'Sad', 'Angry', 'Tired')
+SENTIMENTS = ('Positive', 'Neutral', 'Negative')
+MOOD_CODES = {mood: code for code, mood in enumerate(MOODS, 1)}
+SENTIMENT_CODES = {sentiment: code for code, sentiment in enumerate(SENTIMENTS, 1)}
+
+COLUMNS = {
+    'user_id': np.dtype('<i4'),
+    'day': np.dtype('<i4'),  # days since 1970-01-01 of the entry date
+    'mood': np.dtype('u1'),
+    'sentiment': np.dtype('u1'),
+}
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+EPOCH = date(1970, 1, 1)
+
+def snapshot_dir():
+    return current_app.config.get('ANALYTICS_SNAPSHOT_DIR') or \
+        os.path.join(current_app.instance_path, 'analytics')
+
+def _column_path(directory, name, generation):
+    return os.path.join(directory, f'{name}.{generation}.{COLUMNS[name].str[1:]}')
+
+def read_manifest(directory):
+    """Return the snapshot manifest, or an empty one if no snapshot was taken yet"""
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'format': SNAPSHOT_FORMAT, 'generation': 0, 'rows': 0, 'watermark': 0}
+
+def _write_manifest(directory, manifest):
+    # Readers trust only the manifest; replacing it atomically publishes the
+    # appended rows all at once
+    path = os.path.join(directory, 'manifest.json')
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+@contextmanager
+def _exclusive(directory):
+    """Hold the snapshot lock so only one export job appends at a time"""
+    with open(os.path.join(directory, '.lock'), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _encode(rows):
+    """Turn (user_id, date, mood, sentiment) tuples into column arrays"""
+    user_ids, days, moods, sentiments = [], [], [], []
+    for user_id, entry_date, mood, sentiment in rows:
+        user_ids.append(user_id)
+        days.append((entry_date.date() - EPOCH).days)
+        moods.append(MOOD_CODES.get(mood, 0))
+        sentiments.append(SENTIMENT_CODES.get(sentiment, 0))
+    return {
+        'user_id': np.array(user_ids, dtype=COLUMNS['user_id']),
+        'day': np.array(days, dtype=COLUMNS['day']),
+        'mood': np.array(moods, dtype=COLUMNS['mood']),
+        'sentiment': np.array(sentiments, dtype=COLUMNS['sentiment']),
+    }
+
+def _discard_unpublished(directory, manifest):
+    """Drop anything a crashed run appended without publishing it"""
+    # Published rows are untouched, so readers mapping them are unaffected
+    for name, dtype in COLUMNS.items():
+        with open(_column_path(directory, name, manifest['generation']), 'ab') as f:
+            f.truncate(manifest['rows'] * dtype.itemsize)
+
+def _append(directory, manifest, rows, watermark):
+    """Append encoded rows to every column file, then publish them in a new manifest"""
+    columns = _encode(rows)
+    for name, values in columns.items():
+        with open(_column_path(directory, name, manifest['generation']), 'ab') as f:
+            values.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'generation': manifest['generation'],
+        'rows': manifest['rows'] + len(rows),
+        'watermark': watermark,
+        'moods': list(MOODS),
+        'sentiments': list(SENTIMENTS),
+        'columns': {name: dtype.str for name, dtype in COLUMNS.items()},
+        'updated_at': datetime.utcnow().isoformat()
+    }
+    _write_manifest(directory, manifest)
+    return manifest
+
+def _export_new_entries(directory, manifest, batch_size, lag, progress):
+    """Append entries above the manifest's watermark, returning the last manifest and the rows appended"""
+    cutoff = datetime.utcnow() - timedelta(seconds=lag)
+    appended = 0
+
+    while True:
+        batch = db.session.execute(
+            select(Entry.id, Entry.user_id, Entry.date, Entry.mood, Entry.sentiment)
+            .where(Entry.id > manifest['watermark'],
+                   or_(Entry.created_at.is_(None), Entry.created_at <= cutoff))
+            .order_by(Entry.id)
+            .limit(batch_size)
+        ).all()
+        db.session.commit()
+        if not batch:
+            break
+
+        manifest = _append(directory, manifest, [row[1:] for row in batch], batch[-1].id)
+        appended += len(batch)
+        if progress:
+            progress(appended, manifest['watermark'])
+
+    return manifest, appended
+
+def export_entries(directory=None, batch_size=50000, lag=300, progress=None):
+    """
+    Append entries created since the last export to the snapshot
+    Rows are read in id order above the stored watermark. Entries younger than
+    `lag` seconds are left for the next run so a transaction that commits a
+    lower id late is not skipped. Edits and deletes made after an entry was
+    exported are not reflected; rebuild the snapshot to pick them up
+    Returns the number of rows appended
+    """
+    directory = directory or snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    with _exclusive(directory):
+        manifest = read_manifest(directory)
+        _discard_unpublished(directory, manifest)
+        _, appended = _export_new_entries(directory, manifest, batch_size, lag, progress)
+
+    return appended
+
+def rebuild(directory=None, batch_size=50000, lag=300, progress=None):
+    """
+    Export every entry again, archived ones included, into a new generation of
+    column files. The generation is built in a side directory and published by
+    replacing the manifest once it is complete, so readers see the old snapshot
+    until then. Files of older generations are removed afterwards; readers
+    that still map them keep working until they close them
+    """
+    directory = directory or snapshot_dir()
+    staging = os.path.join(directory, 'rebuild')
+    os.makedirs(directory, exist_ok=True)
+
+    with _exclusive(directory):
+        generation = read_manifest(directory)['generation'] + 1
+        # Whatever an interrupted rebuild left behind was never published
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        manifest = {'format': SNAPSHOT_FORMAT, 'generation': generation, 'rows': 0, 'watermark': 0}
+        _discard_unpublished(staging, manifest)
+
+        # Archived entries are old and no longer in the entries table, so the
+        # incremental export never sees them again
+        rows = []
+        for block in db.session.execute(select(EntryArchive.data)).scalars():
+            rows += [(data['user_id'], datetime.fromisoformat(data['date']), data['mood'], data['sentiment'])
+                     for data in decompress_block(block)]
+            if len(rows) >= batch_size:
+                manifest = _append(staging, manifest, rows, 0)
+                rows = []
+        if rows:
+            manifest = _append(staging, manifest, rows, 0)
+        db.session.commit()
+
+        manifest, _ = _export_new_entries(staging, manifest, batch_size, lag, progress)
+
+        # The new files sit beside the live generation under their own names
+        # until the manifest switches readers over to them
+        for name in COLUMNS:
+            os.replace(_column_path(staging, name, generation), _column_path(directory, name, generation))
+        _write_manifest(directory, manifest)
+        shutil.rmtree(staging)
+
+    for filename in os.listdir(directory):
+        parts = filename.split('.')
+        if len(parts) == 3 and parts[0] in COLUMNS and parts[1].isdigit() and int(parts[1]) < generation:
+            os.remove(os.path.join(directory, filename))
+    return manifest['rows']
+
+class Snapshot:
+    """Read-only, memory-mapped view of the published snapshot rows"""
+
+    def __init__(self, directory=None):
+        directory = directory or snapshot_dir()
+        self.manifest = read_manifest(directory)
+        self.rows = self.manifest['rows']
+        self.columns = {}
+        for name, dtype in COLUMNS.items():
+            if self.rows:
+                path = _column_path(directory, name, self.manifest['generation'])
+                self.columns[name] = np.memmap(path, dtype=dtype,
+                                               mode='r', shape=(self.rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=dtype)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def _day_mask(self, start=None, end=None):
+        """Boolean mask of rows dated between `start` and `end` (inclusive dates), or None for all"""
+        if start is None and end is None:
+            return None
+        days = self.columns['day']
+        mask = np.ones(self.rows, dtype=bool)
+        if start is not None:
+            mask &= days >= (start - EPOCH).days
+        if end is not None:
+            mask &= days <= (end - EPOCH).days
+        return mask
+
+def _periods(days, period):
+    """Map day numbers to period numbers and a function turning a period number back into its start date"""
+    if period == 'day':
+        return days, lambda p: EPOCH + timedelta(days=int(p))
+    if period == 'week':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return (days + 3) // 7, lambda p: EPOCH + timedelta(days=int(p) * 7 - 3)
+    if period == 'month':
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return months, lambda p: date(1970 + int(p) // 12, int(p) % 12 + 1, 1)
+    raise ValueError(f'Unknown period {period!r}')
+
+def _crosstab(groups, codes, width):
+    """Count rows per (group, code) with a single bincount, returning (group values, counts matrix)"""
+    if groups.size == 0:
+        return np.empty(0, dtype=np.int64), np.zeros((0, width), dtype=np.int64)
+    low = int(groups.min())
+    index = (groups.astype(np.int64) - low) * width + codes
+    counts = np.bincount(index, minlength=(int(groups.max()) - low + 1) * width).reshape(-1, width)
+    present = counts.any(axis=1)
+    return np.nonzero(present)[0] + low, counts[present]
+
+def mood_distribution(snapshot, period='week', start=None, end=None):
+    """Number of entries per mood in each day, week or month"""
+    mask = snapshot._day_mask(start, end)
+    days = snapshot['day'] if mask is None else snapshot['day'][mask]
+    moods = snapshot['mood'] if mask is None else snapshot['mood'][mask]
+
+    groups, to_date = _periods(days, period)
+    values, counts = _crosstab(groups, moods, len(MOODS) + 1)
+    return [
+        {
+            'period': to_date(value).isoformat(),
+            'total': int(row.sum()),
+            'moods': {mood: int(row[code]) for mood, code in MOOD_CODES.items()}
+        }
+        for value, row in zip(values, counts)
+    ]
+
+def sentiment_by_weekday(snapshot, start=None, end=None):
+    """Share of positive, neutral and negative entries written on each day of the week"""
+    mask = snapshot._day_mask(start, end)
+    days = snapshot['day'] if mask is None else snapshot['day'][mask]
+    sentiments = snapshot['sentiment'] if mask is None else snapshot['sentiment'][mask]
+
+    weekdays = (days.astype(np.int64) + 3) % 7
+    width = len(SENTIMENTS) + 1
+    counts = np.bincount(weekdays * width + sentiments, minlength=7 * width).reshape(7, width)
+
+    result = []
+    for weekday, row in enumerate(counts):
+        scored = int(row[1:].sum())
+        result.append({
+            'weekday': WEEKDAYS[weekday],
+            'total': int(row.sum()),
+            'sentiments': {
+                sentiment: {
+                    'count': int(row[code]),
+                    'share': round(float(row[code]) / scored, 4) if scored else 0.0
+                }
+                for sentiment, code in SENTIMENT_CODES.items()
+            }
+        })
+    return result
+
+def summary(snapshot):
+    """Row and user counts and the date range covered by the snapshot"""
+    days = snapshot['day']
+    return {
+        'entries': snapshot.rows,
+        'users': int(np.unique(snapshot['user_id']).size),
+        'first_date': (EPOCH + timedelta(days=int(days.min()))).isoformat() if snapshot.rows else None,
+        'last_date': (EPOCH + timedelta(days=int(days.max()))).isoformat() if snapshot.rows else None,
+        'watermark': snapshot.manifest['watermark'],
+        'updated_at': snapshot.manifest.get('updated_at')
+    }
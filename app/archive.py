@@ -0,0 +1,279 @@
+"""
+Cold-data archival for the Serene application
+Moves journal entries older than ARCHIVE_AFTER_DAYS out of the hot entries
+table into one compressed block per user per month, and reads them back
+transparently alongside the hot rows
+"""
+import json
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, delete, func
+
+from app import db
+from app.models.entry import Entry
+from app.models.entry_archive import EntryArchive
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+
+DATETIME_FIELDS = ('date', 'created_at', 'updated_at')
+
+class ArchivedEntry:
+    """Read-only stand-in for an Entry that lives in an archive block"""
+
+    archived = True
+
+    def __init__(self, data):
+        self.data = data
+        for key, value in data.items():
+            if key in DATETIME_FIELDS and value:
+                value = datetime.fromisoformat(value)
+            setattr(self, key, value)
+
+    def to_dict(self):
+        """Convert to dictionary for API responses"""
+        return dict(self.data)
+
+    def __repr__(self):
+        return f'<ArchivedEntry {self.id} {self.date.strftime("%Y-%m-%d")} {self.mood}>'
+
+def compress_block(entries):
+    """Serialize entry dicts into a compressed block"""
+    payload = json.dumps(entries, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(payload, 9)
+
+def decompress_block(data):
+    """Return the entry dicts stored in a compressed block"""
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+def archive_cutoff(days=None, now=None):
+    """
+    Entries dated before the returned time are archived
+    Rounded down to a month boundary so only whole months are ever archived
+    """
+    if days is None:
+        days = current_app.config.get('ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+    boundary = (now or datetime.utcnow()) - timedelta(days=days)
+    return datetime(boundary.year, boundary.month, 1)
+
+def mood_counts(entries):
+    """{mood: number of entries} over entry dicts, as stored on a block"""
+    return dict(Counter(entry['mood'] for entry in entries))
+
+def _set_entries(block, entries):
+    """Store entry dicts in a block along with the summaries read without decompressing it"""
+    block.data = compress_block(entries)
+    block.entry_count = len(entries)
+    block.min_entry_id = min(entry['id'] for entry in entries)
+    block.max_entry_id = max(entry['id'] for entry in entries)
+    block.max_change_seq = max(entry.get('change_seq') or 0 for entry in entries)
+    block.mood_counts = mood_counts(entries)
+    block.updated_at = datetime.utcnow()
+
+def _month_range(year, month):
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+def _write_block(user_id, year, month, new_entries):
+    """Merge entry dicts into the user's block for the month, recompressing it"""
+    block = EntryArchive.query.filter_by(user_id=user_id, year=year, month=month) \
+                              .with_for_update().first()
+    if block is None:
+        block = EntryArchive(user_id=user_id, year=year, month=month)
+        db.session.add(block)
+        entries = []
+    else:
+        entries = decompress_block(block.data)
+
+    known = {entry['id'] for entry in new_entries}
+    entries = [entry for entry in entries if entry['id'] not in known] + new_entries
+    entries.sort(key=lambda entry: entry['date'])
+
+    _set_entries(block, entries)
+
+def archive_user_month(user_id, year, month):
+    """Move one user's hot entries for one month into its archive block"""
+    start, end = _month_range(year, month)
+    # Lock the rows so an edit racing the archival is not lost
+    entries = Entry.query.filter(
+        Entry.user_id == user_id,
+        Entry.date >= start,
+        Entry.date < end
+    ).with_for_update().all()
+    if not entries:
+        db.session.rollback()
+        return 0
+
+    _write_block(user_id, year, month, [entry.to_dict() for entry in entries])
+
+    # A Core delete bypasses the session's change tracking, so sync clients get
+    # no tombstones: archived entries still exist
+    ids = [entry.id for entry in entries]
+    db.session.execute(delete(Entry).where(Entry.id.in_(ids)).execution_options(synchronize_session=False))
+    db.session.commit()
+    return len(ids)
+
+def archive_entries(days=None, pause=0, progress=None):
+    """
+    Archive every entry older than the cutoff, one user-month at a time
+    Returns the number of entries moved
+    """
+    cutoff = archive_cutoff(days)
+    moved = 0
+    last_user_id = 0
+
+    while True:
+        # Walk users with cold entries in keyset order
+        user_id = db.session.execute(
+            select(func.min(Entry.user_id)).where(Entry.user_id > last_user_id, Entry.date < cutoff)
+        ).scalar()
+        db.session.commit()
+        if user_id is None:
+            break
+        last_user_id = user_id
+
+        dates = db.session.execute(
+            select(Entry.date).where(Entry.user_id == user_id, Entry.date < cutoff)
+        ).scalars().all()
+        db.session.commit()
+
+        for year, month in sorted({(date.year, date.month) for date in dates}):
+            count = archive_user_month(user_id, year, month)
+            moved += count
+            if progress:
+                progress(user_id, year, month, count)
+            if pause:
+                time.sleep(pause)
+
+    return moved
+
+def get_archived_entry(entry_id, user_id):
+    """Return the archived entry with `entry_id` owned by `user_id`, or None"""
+    blocks = EntryArchive.query.filter(
+        EntryArchive.user_id == user_id,
+        EntryArchive.max_entry_id >= entry_id,
+        EntryArchive.min_entry_id <= entry_id
+    ).all()
+    for block in blocks:
+        for data in decompress_block(block.data):
+            if data['id'] == entry_id:
+                return ArchivedEntry(data)
+    return None
+
+def restore_entry(entry_id, user_id):
+    """Move an archived entry back into the hot table so it can be edited or deleted"""
+    blocks = EntryArchive.query.filter(
+        EntryArchive.user_id == user_id,
+        EntryArchive.max_entry_id >= entry_id,
+        EntryArchive.min_entry_id <= entry_id
+    ).with_for_update().all()
+    for archive in blocks:
+        entries = decompress_block(archive.data)
+        found = [data for data in entries if data['id'] == entry_id]
+        if not found:
+            continue
+
+        remaining = [data for data in entries if data['id'] != entry_id]
+        if remaining:
+            _set_entries(archive, remaining)
+        else:
+            db.session.delete(archive)
+
+        archived = ArchivedEntry(found[0])
+        entry = Entry(
+            id=archived.id,
+            user_id=archived.user_id,
+            date=archived.date,
+            mood=archived.mood,
+            journal_entry=archived.journal_entry,
+            sentiment=archived.sentiment,
+            sentiment_version=getattr(archived, 'sentiment_version', None),
+            created_at=archived.created_at
+        )
+        db.session.add(entry)
+        db.session.flush()
+        return entry
+    return None
+
+def get_entries_between(user_id, start, end):
+    """
+    Return the user's entries dated between `start` and `end` (inclusive), newest first
+    Hot rows and archived blocks are merged, so callers need not know where an entry lives
+    """
+    entries = Entry.query.filter(
+        Entry.user_id == user_id,
+        Entry.date >= start,
+        Entry.date <= end
+    ).order_by(Entry.date.desc()).all()
+
+    # Block metadata is tiny; only blocks for months inside the range are decompressed
+    first, last = (start.year, start.month), (end.year, end.month)
+    blocks = EntryArchive.query.with_entities(
+        EntryArchive.id, EntryArchive.year, EntryArchive.month
+    ).filter(
+        EntryArchive.user_id == user_id,
+        EntryArchive.year >= start.year,
+        EntryArchive.year <= end.year
+    ).all()
+    block_ids = [block.id for block in blocks if first <= (block.year, block.month) <= last]
+
+    if block_ids:
+        for block in EntryArchive.query.filter(EntryArchive.id.in_(block_ids)):
+            for data in decompress_block(block.data):
+                archived = ArchivedEntry(data)
+                if start <= archived.date <= end:
+                    entries.append(archived)
+        entries.sort(key=lambda entry: entry.date, reverse=True)
+
+    return entries
+
+
+def get_recent_entries(user_id, limit):
+    """Return the user's `limit` newest entries, reaching into the archive only if the hot table has too few"""
+    entries = Entry.query.filter_by(user_id=user_id).order_by(Entry.date.desc()).limit(limit).all()
+    if len(entries) >= limit:
+        return entries
+
+    # Archived entries are all older than the hot ones; read blocks newest first
+    blocks = EntryArchive.query.filter_by(user_id=user_id) \
+                               .order_by(EntryArchive.year.desc(), EntryArchive.month.desc())
+    for block in blocks:
+        archived = [ArchivedEntry(data) for data in decompress_block(block.data)]
+        archived.sort(key=lambda entry: entry.date, reverse=True)
+        entries += archived[:limit - len(entries)]
+        if len(entries) >= limit:
+            break
+    return entries
+
+def count_moods(user_id):
+    """Return {mood: number of entries} over the user's hot and archived entries"""
+    counts = dict(db.session.query(Entry.mood, func.count(Entry.id))
+                            .filter(Entry.user_id == user_id)
+                            .group_by(Entry.mood)
+                            .all())
+    # Each block carries its own counts, so no block is decompressed
+    blocks = EntryArchive.query.filter_by(user_id=user_id).with_entities(EntryArchive.mood_counts)
+    for block in blocks:
+        for mood, count in block.mood_counts.items():
+            counts[mood] = counts.get(mood, 0) + count
+    return counts
+
+def get_archived_changes(user_id, since=None):
+    """
+    Return archived entries changed after sequence `since` (all of them if None)
+    Blocks whose latest change is older are skipped without being decompressed
+    """
+    query = EntryArchive.query.filter(EntryArchive.user_id == user_id)
+    if since is not None:
+        query = query.filter(db.or_(EntryArchive.max_change_seq.is_(None), EntryArchive.max_change_seq > since))
+
+    entries = []
+    for block in query:
+        for data in decompress_block(block.data):
+            if since is None or (data.get('change_seq') or 0) > since:
+                entries.append(ArchivedEntry(data))
+    return entries
\ No newline at end of file
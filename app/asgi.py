@@ -0,0 +1,410 @@
+"""
+Async serving mode for the Serene application
+The busiest JSON endpoints are served by async handlers that talk to the
+database through an async driver, so a client waiting on the network or the
+database costs a coroutine instead of a worker thread. Password hashing and
+sentiment scoring run in executors off the event loop. Every other route is
+handed to the regular Flask app through a WSGI adapter.
+
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+"""
+import asyncio
+import io
+import json
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from a2wsgi import WSGIMiddleware
+from flask import session
+from flask_login import login_user
+from flask_wtf.csrf import CSRFError
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import create_app, csrf, limiter, sentiment_cache, entry_events, token_auth
+from app.limiter import RedisTokenBucket
+from app.models.entry import Entry
+from app.models.user import User
+from app.routes.journal import STREAM_KEEPALIVE, STREAM_MAX_AGE
+from app.tokens import bearer_token
+from app.utils import score_sentiment, sentiment_version
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+}
+
+def scoring_workers():
+    """
+    Scorer processes per server worker: SCORING_WORKERS, or the cores shared
+    out between the WEB_CONCURRENCY workers so they do not oversubscribe the host
+    """
+    if os.environ.get('SCORING_WORKERS'):
+        return max(1, int(os.environ['SCORING_WORKERS']))
+    cores = os.cpu_count() or 1
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores + 1))
+    return max(1, cores // max(1, workers))
+
+def client_address(request, trusted_proxies=0):
+    """
+    The client's address, read from X-Forwarded-For when `trusted_proxies`
+    reverse proxies sit in front of the app, as ProxyFix does for the Flask app
+    """
+    if trusted_proxies:
+        forwarded = [value.strip() for value in ','.join(request.headers.getlist('x-forwarded-for')).split(',')]
+        if len(forwarded) >= trusted_proxies:
+            return forwarded[-trusted_proxies]
+    return request.client.host if request.client else None
+
+def async_database_url(url):
+    """The async-driver equivalent of a synchronous SQLAlchemy database URL"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend} databases')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+class FlaskBridge:
+    """
+    Runs the small synchronous parts of a request (session cookie, CSRF check,
+    login) inside a short-lived Flask request context on a worker thread, so
+    async handlers share sessions with the Flask app
+    """
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+
+    def _environ(self, request):
+        url = request.url
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': url.hostname or 'localhost',
+            'SERVER_PORT': str(url.port or (443 if url.scheme == 'https' else 80)),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': client_address(request, self.app.config['TRUSTED_PROXIES']) or '',
+            'wsgi.url_scheme': url.scheme,
+            # The body has already been read by the async handler
+            'wsgi.input': io.BytesIO(),
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace('-', '_')
+            if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                continue
+            key = 'HTTP_' + key
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def _authenticate(self, environ, check_csrf):
+        with self.app.request_context(environ):
+            if check_csrf and self.app.config.get('WTF_CSRF_ENABLED', True):
+                try:
+                    csrf.protect()
+                except CSRFError as e:
+                    return None, e.description
+            user_id = session.get('_user_id')
+            return (int(user_id) if user_id else None), None
+
+    async def authenticate(self, request, check_csrf=True):
+        """Return (user id or None, CSRF error or None) for the request's session"""
+        return await run_in_threadpool(self._authenticate, self._environ(request), check_csrf)
+
+    def _login(self, environ, user):
+        with self.app.request_context(environ):
+            login_user(user)
+            response = self.app.response_class()
+            self.app.session_interface.save_session(self.app, session, response)
+            return response.headers
+
+    async def login(self, request, user):
+        """Log `user` in, returning the session cookie headers to set on the response"""
+        return await run_in_threadpool(self._login, self._environ(request), user)
+
+class AsyncAPI:
+    """Async handlers for the hot /api/* endpoints"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.bridge = FlaskBridge(flask_app)
+        self.engine = None
+        self.sessions = None
+        self.hashing = None
+        self.scoring = None
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        # Created per worker process, after any fork
+        config = self.flask_app.config
+        self.engine = create_async_engine(
+            async_database_url(config['SQLALCHEMY_DATABASE_URI']),
+            pool_size=int(os.environ.get('ASYNC_DB_POOL_SIZE', 10)),
+            pool_pre_ping=True
+        )
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        cores = os.cpu_count() or 1
+        # hashlib releases the GIL, so threads hash in parallel; the sentiment
+        # scorer is pure Python and needs processes to get off the GIL
+        self.hashing = ThreadPoolExecutor(max_workers=cores, thread_name_prefix='password-hash')
+        self.scoring = self._scoring_pool()
+        try:
+            yield
+        finally:
+            self.scoring.shutdown(cancel_futures=True)
+            self.hashing.shutdown(cancel_futures=True)
+            await self.engine.dispose()
+
+    def _scoring_pool(self):
+        return ProcessPoolExecutor(max_workers=scoring_workers(),
+                                   mp_context=multiprocessing.get_context('spawn'))
+
+    async def _json(self, request):
+        try:
+            data = await request.json()
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    async def _admit(self, name, client):
+        """
+        Apply the named admission limiter to `client` (as AdmissionController.client_key
+        names it), returning (release callback, rejection response)
+        """
+        endpoint = limiter.limiters.get(name)
+        if endpoint is None:
+            return None, None
+
+        def admit():
+            with self.flask_app.app_context():
+                return endpoint.admit(client)
+
+        if isinstance(endpoint.bucket, RedisTokenBucket):
+            rejection = await run_in_threadpool(admit)
+        else:
+            rejection = admit()
+        if rejection is None:
+            return endpoint.release, None
+
+        status, message, wait = rejection
+        return None, JSONResponse({'error': message}, status_code=status,
+                                  headers={'Retry-After': str(max(1, math.ceil(wait)))})
+
+    async def _score(self, text):
+        """Sentiment for `text`, scored in the process pool on a cache miss"""
+        # The in-memory cache is read inline; the optional disk store is file I/O
+        on_disk = sentiment_cache.store is not None
+        if on_disk:
+            result = await run_in_threadpool(sentiment_cache.lookup, text)
+        else:
+            result = sentiment_cache.lookup(text)
+        if result is None:
+            sentiment_cache.misses += 1
+            loop = asyncio.get_running_loop()
+            pool = self.scoring
+            try:
+                result = await loop.run_in_executor(pool, score_sentiment, text)
+            except BrokenProcessPool:
+                # A scorer process died (e.g. killed for memory); replace the pool once
+                if self.scoring is pool:
+                    self.scoring = self._scoring_pool()
+                result = await loop.run_in_executor(self.scoring, score_sentiment, text)
+            if on_disk:
+                await run_in_threadpool(sentiment_cache.add, text, result)
+            else:
+                sentiment_cache.add(text, result)
+        return result
+
+    async def _token_claims(self, request):
+        """Claims of the request's bearer token, or None if it is missing or invalid"""
+        token = bearer_token(request)
+        if token is None:
+            return None
+        # Only the first verification in a process loads the revocation list
+        if token_auth.revoked.pid != os.getpid():
+            return await run_in_threadpool(token_auth.verify_access, token)
+        return token_auth.verify_access(token)
+
+    async def _current_user_id(self, request, check_csrf=True):
+        """Return (user id, None) or (None, error response)"""
+        if bearer_token(request) is not None:
+            # Bearer requests need neither the session nor a CSRF token
+            claims = await self._token_claims(request)
+            if claims is None:
+                return None, JSONResponse({'error': 'Invalid or expired token'}, status_code=401,
+                                          headers={'WWW-Authenticate': 'Bearer error="invalid_token"'})
+            return claims['user']['id'], None
+
+        user_id, csrf_error = await self.bridge.authenticate(request, check_csrf)
+        if csrf_error:
+            return None, JSONResponse({'error': csrf_error}, status_code=400)
+        if user_id is None:
+            return None, JSONResponse({'error': 'Authentication required'}, status_code=401)
+        return user_id, None
+
+    async def login(self, request):
+        """API endpoint for user login"""
+        # Checked before anything expensive, as Flask's before_request hook does
+        _, csrf_error = await self.bridge.authenticate(request)
+        if csrf_error:
+            return JSONResponse({'error': csrf_error}, status_code=400)
+
+        remote_addr = client_address(request, self.flask_app.config['TRUSTED_PROXIES'])
+        release, rejection = await self._admit('login', f'ip:{remote_addr}')
+        if rejection is not None:
+            return rejection
+        try:
+            data = await self._json(request)
+            if not data or not all(key in data for key in ('username', 'password')):
+                return JSONResponse({'error': 'Missing username or password'}, status_code=400)
+
+            async with self.sessions() as db_session:
+                user = (await db_session.execute(
+                    select(User).where(User.username == data['username'])
+                )).scalar_one_or_none()
+
+            loop = asyncio.get_running_loop()
+            if not user or not await loop.run_in_executor(self.hashing, user.verify_password, data['password']):
+                return JSONResponse({'error': 'Invalid username or password'}, status_code=401)
+
+            headers = await self.bridge.login(request, user)
+            response = JSONResponse(user.to_dict())
+            for name, value in headers.items():
+                if name.lower() in ('set-cookie', 'vary'):
+                    response.headers.append(name, value)
+            return response
+        finally:
+            if release:
+                release()
+
+    async def user(self, request):
+        """API endpoint to get current user info"""
+        if bearer_token(request) is not None:
+            # The access token's claims are the user's profile
+            claims = await self._token_claims(request)
+            if claims is None:
+                return JSONResponse({'error': 'Invalid or expired token'}, status_code=401,
+                                    headers={'WWW-Authenticate': 'Bearer error="invalid_token"'})
+            return JSONResponse(claims['user'])
+
+        user_id, error = await self._current_user_id(request, check_csrf=False)
+        if error is not None:
+            return error
+
+        async with self.sessions() as db_session:
+            user = await db_session.get(User, user_id)
+        if user is None:
+            return JSONResponse({'error': 'Authentication required'}, status_code=401)
+        return JSONResponse(user.to_dict())
+
+    async def analyze_sentiment(self, request):
+        """API endpoint for analyzing sentiment of text"""
+        user_id, error = await self._current_user_id(request)
+        if error is not None:
+            return error
+
+        release, rejection = await self._admit('sentiment', f'user:{user_id}')
+        if rejection is not None:
+            return rejection
+        try:
+            data = await self._json(request)
+            if not data or 'text' not in data:
+                return JSONResponse({'error': 'No text provided'}, status_code=400)
+
+            result = await self._score(data['text'])
+            return JSONResponse({'sentiment': result.label, 'score': result.score})
+        finally:
+            if release:
+                release()
+
+    async def create_entry(self, request):
+        """API endpoint for creating a journal entry"""
+        user_id, error = await self._current_user_id(request)
+        if error is not None:
+            return error
+
+        data = await self._json(request)
+        if not data or not all(key in data for key in ('mood', 'journal_entry')):
+            return JSONResponse({'error': 'Missing required fields'}, status_code=400)
+
+        # Analyze sentiment if not provided
+        sentiment = data.get('sentiment')
+        version = None
+        if not sentiment:
+            sentiment = (await self._score(data['journal_entry'])).label
+            version = sentiment_version()
+
+        entry = Entry(
+            user_id=user_id,
+            date=datetime.utcnow(),
+            mood=data['mood'],
+            journal_entry=data['journal_entry'],
+            sentiment=sentiment,
+            sentiment_version=version
+        )
+        # The change-tracking flush hook on Entry runs here as it does under Flask
+        async with self.sessions() as db_session:
+            db_session.add(entry)
+            await db_session.commit()
+
+        payload = entry.to_dict()
+        await run_in_threadpool(entry_events.publish, user_id, 'created', payload)
+        return JSONResponse(payload, status_code=201)
+
+    async def stream_entries(self, request):
+        """Server-Sent Events stream of the current user's entry changes"""
+        user_id, error = await self._current_user_id(request, check_csrf=False)
+        if error is not None:
+            return error
+
+        async def generate():
+            # An idle stream is a pending coroutine, not a blocked thread
+            subscription = entry_events.subscribe(user_id, loop=asyncio.get_running_loop())
+            try:
+                yield 'retry: 3000\n\n'
+                loop = asyncio.get_running_loop()
+                opened = loop.time()
+                while loop.time() - opened < STREAM_MAX_AGE:
+                    event = await subscription.get(timeout=STREAM_KEEPALIVE)
+                    if event is None:
+                        yield ': keep-alive\n\n'
+                        continue
+                    yield f"event: {event['type']}\ndata: {json.dumps(event.get('data'))}\n\n"
+            finally:
+                subscription.close()
+
+        return StreamingResponse(generate(), media_type='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
+def create_asgi_app(flask_app=None):
+    """ASGI application serving the async API routes and the Flask app for everything else"""
+    flask_app = flask_app or create_app()
+    api = AsyncAPI(flask_app)
+
+    app = Starlette(
+        routes=[
+            Route('/api/login', api.login, methods=['POST']),
+            Route('/api/user', api.user, methods=['GET']),
+            Route('/api/analyze-sentiment', api.analyze_sentiment, methods=['POST']),
+            Route('/api/entries', api.create_entry, methods=['POST']),
+            Route('/api/entries/stream', api.stream_entries, methods=['GET']),
+            Mount('/', app=WSGIMiddleware(flask_app)),
+        ],
+        lifespan=api.lifespan
+    )
+    # Lets the gunicorn hooks warm up and reset the Flask side
+    app.state.flask_app = flask_app
+    return app
@@ -0,0 +1,219 @@
+"""
+Activity event ingestion for the Serene application
+Events posted by the games pages are validated, appended to an in-memory
+buffer and written by a background thread in bulk inserts, either every
+ACTIVITY_FLUSH_INTERVAL seconds or as soon as ACTIVITY_FLUSH_SIZE events are
+waiting. The buffer is flushed once more when the process shuts down
+"""
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, text
+
+logger = logging.getLogger(__name__)
+
+# Small integer codes keep every stored event a few dozen bytes
+ACTIVITY_CODES = {
+    'breathing': 1,
+    'memory': 2,
+    'meditation': 3,
+    'drawing': 4,
+    'gratitude': 5,
+    'affirmations': 6,
+}
+
+EVENT_KINDS = {
+    'started': 1,
+    'completed': 2,
+    'abandoned': 3,
+}
+
+# Events older than this, or further in the future than the allowed clock
+# skew, are rejected rather than written to a month that may be dropped
+MAX_EVENT_AGE = timedelta(days=30)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+MAX_DURATION_MS = 24 * 60 * 60 * 1000
+
+def parse_event(event, user_id, now=None):
+    """
+    Validate one client event and return it as a row for the events table
+    Raises ValueError describing the first problem found
+    """
+    if not isinstance(event, dict):
+        raise ValueError('Event must be an object')
+
+    activity = ACTIVITY_CODES.get(event.get('activity'))
+    if activity is None:
+        raise ValueError('Unknown activity')
+    kind = EVENT_KINDS.get(event.get('kind'))
+    if kind is None:
+        raise ValueError('Unknown event kind')
+
+    duration_ms = event.get('duration_ms')
+    if duration_ms is not None:
+        if not isinstance(duration_ms, int) or isinstance(duration_ms, bool) \
+                or not 0 <= duration_ms <= MAX_DURATION_MS:
+            raise ValueError('Invalid duration')
+
+    try:
+        occurred_at = datetime.fromisoformat(event['occurred_at'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Invalid occurred_at')
+    if occurred_at.tzinfo is not None:
+        occurred_at = occurred_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    now = now or datetime.utcnow()
+    if not now - MAX_EVENT_AGE <= occurred_at <= now + MAX_CLOCK_SKEW:
+        raise ValueError('occurred_at out of range')
+
+    return {
+        'user_id': user_id,
+        'occurred_at': occurred_at,
+        'activity': activity,
+        'kind': kind,
+        'duration_ms': duration_ms
+    }
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+def _next_month(start):
+    return datetime(start.year + 1, 1, 1) if start.month == 12 else datetime(start.year, start.month + 1, 1)
+
+def ensure_partitions(connection, months):
+    """Create the monthly PostgreSQL partitions for `months` (month start datetimes) if missing"""
+    for start in sorted(months):
+        name = f'activity_events_y{start.year}m{start.month:02d}'
+        connection.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF activity_events '
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{_next_month(start):%Y-%m-%d}')"
+        ))
+
+def _insert_ignoring_duplicates(dialect_name):
+    """Bulk insert that skips events already stored, so client retries are harmless"""
+    from app.models.activity_event import ActivityEvent
+
+    table = ActivityEvent.__table__
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing()
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+def write_events(engine, rows, chunk_size=1000, partitions=None):
+    """
+    Insert `rows` in multi-row chunks, each chunk in its own transaction
+    `partitions` is a set of months known to have a partition, kept up to date here
+    """
+    partitions = set() if partitions is None else partitions
+    statement = _insert_ignoring_duplicates(engine.dialect.name)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        months = set()
+        with engine.begin() as connection:
+            if engine.dialect.name == 'postgresql':
+                months = {_month_start(row['occurred_at']) for row in chunk} - partitions
+                ensure_partitions(connection, months)
+            connection.execute(statement, chunk)
+        partitions.update(months)
+
+class ActivityBuffer:
+    """Flask extension collecting activity events in memory and writing them in bulk"""
+
+    def __init__(self, app=None):
+        self.events = []
+        self.lock = threading.Lock()
+        # Held for a whole flush so the shutdown flush never races the thread's
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.flusher = None
+        self.pid = None
+        self.app = None
+        self.partitions = set()
+        self.flushed = 0
+        self.failures = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ACTIVITY_FLUSH_INTERVAL', 2.0)
+        app.config.setdefault('ACTIVITY_FLUSH_SIZE', 1000)
+        app.config.setdefault('ACTIVITY_BUFFER_LIMIT', 50000)
+
+        self.app = app
+        self.interval = float(app.config['ACTIVITY_FLUSH_INTERVAL'])
+        self.flush_size = int(app.config['ACTIVITY_FLUSH_SIZE'])
+        self.limit = int(app.config['ACTIVITY_BUFFER_LIMIT'])
+        atexit.register(self.close)
+
+    def add(self, rows):
+        """
+        Queue rows for the next flush
+        Returns False, queueing nothing, when the buffer is full (the database is
+        down or too slow); the caller should ask the client to retry later
+        """
+        with self.lock:
+            if len(self.events) + len(rows) > self.limit:
+                return False
+            self.events.extend(rows)
+            full = len(self.events) >= self.flush_size
+            self._ensure_flusher()
+        if full:
+            self.wakeup.set()
+        return True
+
+    def pending(self):
+        with self.lock:
+            return len(self.events)
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork: each worker starts its own on first use
+        if self.flusher is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.flusher = threading.Thread(target=self._run, name='activity-flush', daemon=True)
+            self.flusher.start()
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every buffered event now; returns the number written"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.events = self.events, []
+            if not batch:
+                return 0
+
+            try:
+                from app import db
+                with self.app.app_context():
+                    write_events(db.engine, batch, self.flush_size, self.partitions)
+            except Exception:
+                self.failures += 1
+                logger.exception('Failed to write %d activity events, will retry', len(batch))
+                # Put the batch back in front; add() refuses new events once the limit is reached
+                with self.lock:
+                    self.events[:0] = batch
+                return 0
+
+            self.flushed += len(batch)
+            return len(batch)
+
+    def close(self):
+        """Stop the flush thread and write whatever is still buffered"""
+        self.stopping = True
+        self.wakeup.set()
+        if self.flusher is not None and self.pid == os.getpid() and self.flusher.is_alive():
+            self.flusher.join(timeout=self.interval + 5)
+        if self.app is not None:
+            self.flush()
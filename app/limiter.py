@@ -0,0 +1,255 @@
+"""
+Admission control for the Serene application
+Token-bucket rate limits and concurrency caps for CPU-heavy endpoints, so that
+a burst of logins or sentiment requests is shed quickly instead of starving
+the worker pool that also serves the cheap dashboard and journal reads
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify, current_app
+from flask_login import current_user
+
+# Per-endpoint limits: sustained requests per second and burst size for the
+# endpoint as a whole and for each client (user, or IP address before login),
+# and the number of requests allowed to run at once in a single worker
+DEFAULT_LIMITS = {
+    'login': {'rate': 10, 'burst': 20, 'client_rate': 0.2, 'client_burst': 5, 'concurrency': 4},
+    'register': {'rate': 5, 'burst': 10, 'client_rate': 0.05, 'client_burst': 3, 'concurrency': 2},
+    'sentiment': {'rate': 50, 'burst': 100, 'client_rate': 5, 'client_burst': 20, 'concurrency': 8},
+}
+
+# Per-client buckets kept by each worker without a shared backend
+MAX_TRACKED_CLIENTS = 10000
+
+class TokenBucket:
+    """Thread-safe in-process token bucket"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, returning (allowed, seconds until a token is available)"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0
+            return False, (1 - self.tokens) / self.rate
+
+class ClientBuckets:
+    """In-process token buckets per client, forgetting the least recently seen beyond `max_clients`"""
+
+    def __init__(self, rate, burst, max_clients=MAX_TRACKED_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, client):
+        """Take a token from `client`'s bucket, returning (allowed, seconds until a token is available)"""
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                bucket = self.buckets[client] = TokenBucket(self.rate, self.burst)
+                while len(self.buckets) > self.max_clients:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(client)
+        return bucket.acquire()
+
+class RedisTokenBucket:
+    """Token bucket shared by every worker through Redis"""
+
+    # Refill and take a token atomically using the Redis server clock
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring((1 - tokens) / rate)}
+    """
+
+    def __init__(self, client, key, rate, burst):
+        self.key = key
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.script = client.register_script(self.SCRIPT)
+
+    def acquire(self, client=None):
+        """
+        Take a token, returning (allowed, seconds until a token is available);
+        with `client`, from that client's own bucket under this key
+        """
+        key = self.key if client is None else f'{self.key}:{client}'
+        allowed, wait = self.script(keys=[key], args=[self.rate, self.burst])
+        return bool(allowed), 0 if allowed else float(wait)
+
+class EndpointLimiter:
+    """Rate limit, concurrency cap and counters for a single endpoint"""
+
+    def __init__(self, name, bucket, concurrency, client_buckets=None):
+        self.name = name
+        self.bucket = bucket
+        self.client_buckets = client_buckets
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.stats = {
+            'admitted': 0,
+            'rejected_rate': 0,
+            'rejected_client_rate': 0,
+            'rejected_concurrency': 0,
+            'backend_errors': 0,
+            'in_flight': 0
+        }
+
+    def count(self, key, delta=1):
+        with self.lock:
+            self.stats[key] += delta
+
+    def try_rate(self, bucket, *args):
+        """Check a token bucket, failing open if the shared backend is unavailable"""
+        try:
+            return bucket.acquire(*args)
+        except Exception:
+            current_app.logger.exception('Rate limit backend failed for %s', self.name)
+            self.count('backend_errors')
+            return True, 0
+
+    def admit(self, client=None):
+        """
+        Try to admit one request from `client`, returning None if it may
+        proceed or the (status, message, retry after) to reject it with;
+        admitted requests must call release() when they finish
+        """
+        # A client over its own limit is turned away before it spends the endpoint's tokens
+        if self.client_buckets is not None and client is not None:
+            allowed, wait = self.try_rate(self.client_buckets, client)
+            if not allowed:
+                self.count('rejected_client_rate')
+                return 429, 'Too many requests', wait
+
+        allowed, wait = self.try_rate(self.bucket)
+        if not allowed:
+            self.count('rejected_rate')
+            return 429, 'Too many requests', wait
+
+        if not self.slots.acquire(blocking=False):
+            self.count('rejected_concurrency')
+            return 503, 'Server busy', 1
+
+        self.count('admitted')
+        self.count('in_flight')
+        return None
+
+    def release(self):
+        self.count('in_flight', -1)
+        self.slots.release()
+
+class AdmissionController:
+    """Flask extension holding the limiters for every protected endpoint"""
+
+    def __init__(self, app=None):
+        self.limiters = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ADMISSION_LIMITS', DEFAULT_LIMITS)
+        app.config.setdefault('RATELIMIT_STORAGE_URL', None)
+        app.config.setdefault('METRICS_ALLOWED_IPS', {'127.0.0.1', '::1'})
+
+        client = None
+        if app.config['RATELIMIT_STORAGE_URL']:
+            import redis
+            client = redis.Redis.from_url(app.config['RATELIMIT_STORAGE_URL'])
+
+        self.limiters = {}
+        for name, limits in app.config['ADMISSION_LIMITS'].items():
+            client_buckets = None
+            if client is not None:
+                bucket = RedisTokenBucket(client, f'serene:ratelimit:{name}',
+                                          limits['rate'], limits['burst'])
+                if limits.get('client_rate'):
+                    client_buckets = RedisTokenBucket(client, f'serene:ratelimit:{name}:client',
+                                                      limits['client_rate'], limits['client_burst'])
+            else:
+                bucket = TokenBucket(limits['rate'], limits['burst'])
+                if limits.get('client_rate'):
+                    client_buckets = ClientBuckets(limits['client_rate'], limits['client_burst'])
+            self.limiters[name] = EndpointLimiter(name, bucket, limits['concurrency'], client_buckets)
+
+        app.add_url_rule('/metrics', 'admission_metrics', self.metrics_view)
+
+    def limit(self, name, methods=('POST',)):
+        """Decorator applying the named limiter to a view for the given HTTP methods"""
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                limiter = self.limiters.get(name)
+                if limiter is None or request.method not in methods:
+                    return view(*args, **kwargs)
+
+                rejection = limiter.admit(self.client_key())
+                if rejection is not None:
+                    return self._reject(*rejection)
+
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    limiter.release()
+            return wrapped
+        return decorator
+
+    def client_key(self):
+        """Who a request counts against: the logged-in user, else the remote address"""
+        if current_user.is_authenticated:
+            return f'user:{current_user.get_id()}'
+        return f'ip:{request.remote_addr}'
+
+    def _reject(self, status, message, wait):
+        """Build a fast rejection response with a Retry-After header"""
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': message})
+        else:
+            response = current_app.response_class(message, mimetype='text/plain')
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+        return response
+
+    def metrics_view(self):
+        """Expose limiter counters in the Prometheus text format to local scrapers and admins"""
+        if request.remote_addr not in current_app.config['METRICS_ALLOWED_IPS'] and not (
+                current_user.is_authenticated and getattr(current_user, 'is_admin', False)):
+            return current_app.response_class('Forbidden\n', status=403, mimetype='text/plain')
+        lines = []
+        for metric, kind in (('admitted', 'counter'), ('rejected_rate', 'counter'),
+                             ('rejected_client_rate', 'counter'), ('rejected_concurrency', 'counter'),
+                             ('backend_errors', 'counter'), ('in_flight', 'gauge')):
+            lines.append(f'# TYPE serene_admission_{metric} {kind}')
+            for name, limiter in self.limiters.items():
+                lines.append(f'serene_admission_{metric}{{endpoint="{name}"}} {limiter.stats[metric]}')
+        return current_app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,26 @@
+"""
+Activity event model for the Serene application
+Each row records one step of a wellness activity session (started, completed,
+abandoned). Rows are kept narrow and, on PostgreSQL, the table is partitioned
+by month so old months can be detached or dropped without touching the rest
+"""
+from app import db
+
+class ActivityEvent(db.Model):
+    __tablename__ = 'activity_events'
+    __table_args__ = (
+        {'postgresql_partition_by': 'RANGE (occurred_at)'},
+    )
+    
+    # The primary key doubles as the idempotency key for client retries and
+    # includes the partition column, as PostgreSQL requires. There is no foreign
+    # key to users: it would cost a lookup per inserted row, and user ids come
+    # from the authenticated session
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    occurred_at = db.Column(db.DateTime, primary_key=True)
+    activity = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)  # ACTIVITY_CODES in app/ingest.py
+    kind = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)  # EVENT_KINDS in app/ingest.py
+    duration_ms = db.Column(db.Integer, nullable=True)  # time spent, on completed/abandoned events
+    
+    def __repr__(self):
+        return f'<ActivityEvent {self.user_id} {self.activity} {self.kind} {self.occurred_at}>'
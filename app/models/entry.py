@@ -4,10 +4,23 @@ This model represents journal entries created by users
 """
 from datetime import datetime
 
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+
 from app import db
+from app.models.entry_change import EntryChange
+from app.models.user import User
 
 class Entry(db.Model):
     __tablename__ = 'entries'
+    __table_args__ = (
+        # Delta sync reads a user's entries changed after a sequence number
+        db.Index('ix_entries_user_change_seq', 'user_id', 'change_seq'),
+        # Per-user date range reads (journal page, archival)
+        db.Index('ix_entries_user_date', 'user_id', 'date'),
+        # Archived entries keep their ids, so SQLite must never hand them out again
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -15,7 +28,10 @@ class Entry(db.Model):
     mood = db.Column(db.String(20), nullable=False)  # "Happy", "Neutral", "Sad", "Angry", "Tired"
     journal_entry = db.Column(db.Text, nullable=False)
     sentiment = db.Column(db.String(20), nullable=True)  # "Positive", "Neutral", "Negative"
+    sentiment_version = db.Column(db.String(16), nullable=True)  # lexicon version that scored it, None if client-supplied
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    change_seq = db.Column(db.Integer, nullable=True)  # id of the EntryChange for the latest write
     
     def to_dict(self):
         """Convert to dictionary for API responses"""
@@ -26,8 +42,45 @@ class Entry(db.Model):
             'mood': self.mood,
             'journal_entry': self.journal_entry,
             'sentiment': self.sentiment,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'sentiment_version': self.sentiment_version,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'change_seq': self.change_seq
         }
     
     def __repr__(self):
-        return f'<Entry {self.id} {self.date.strftime("%Y-%m-%d")} {self.mood}>'
\ No newline at end of file
+        return f'<Entry {self.id} {self.date.strftime("%Y-%m-%d")} {self.mood}>'
+
+def allocate_change(session, user_id, entry_id, op):
+    """Insert an EntryChange row and return its id as the next change sequence number"""
+    result = session.connection().execute(
+        insert(EntryChange.__table__).values(
+            user_id=user_id, entry_id=entry_id, op=op, created_at=datetime.utcnow()
+        )
+    )
+    return result.inserted_primary_key[0]
+
+@event.listens_for(Session, 'before_flush')
+def track_entry_changes(session, flush_context, instances):
+    """Stamp every created or edited entry with a new change sequence and record tombstones for deletes"""
+    created = [obj for obj in session.new if isinstance(obj, Entry)]
+    edited = [obj for obj in session.dirty
+              if isinstance(obj, Entry) and session.is_modified(obj, include_collections=False)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Entry)]
+    if not (created or edited or deleted):
+        return
+    
+    # Serialize each user's writers so their sequence numbers commit in order
+    # and a sync token never skips a change that commits late
+    user_ids = sorted({entry.user_id for entry in created + edited + deleted})
+    session.connection().execute(
+        select(User.id).where(User.id.in_(user_ids)).order_by(User.id).with_for_update()
+    )
+    
+    now = datetime.utcnow()
+    for entry in created + edited:
+        entry.change_seq = allocate_change(session, entry.user_id, entry.id, 'upsert')
+        entry.updated_at = now
+    
+    for entry in deleted:
+        allocate_change(session, entry.user_id, entry.id, 'delete')
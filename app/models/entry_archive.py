@@ -0,0 +1,32 @@
+"""
+Entry archive model for the Serene application
+Each row holds one user's journal entries for one month, moved out of the hot
+entries table and stored as a single compressed block
+"""
+from datetime import datetime
+
+from app import db
+
+class EntryArchive(db.Model):
+    __tablename__ = 'entry_archives'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', 'month', name='uq_entry_archives_user_month'),
+        # Finds the block holding an archived entry id
+        db.Index('ix_entry_archives_user_max_entry', 'user_id', 'max_entry_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    min_entry_id = db.Column(db.Integer, nullable=False)
+    max_entry_id = db.Column(db.Integer, nullable=False)
+    max_change_seq = db.Column(db.Integer, nullable=True)  # latest change_seq in the block, lets delta sync skip it
+    mood_counts = db.Column(db.JSON, nullable=True, default=dict)  # {mood: entries}, for the dashboard
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON list of Entry.to_dict()
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<EntryArchive {self.user_id} {self.year}-{self.month:02d} ({self.entry_count} entries)>'
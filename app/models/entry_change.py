@@ -0,0 +1,23 @@
+"""
+Entry change model for the Serene application
+Each row allocates the next change sequence number for a journal entry write;
+rows for deleted entries act as tombstones for delta sync
+"""
+from datetime import datetime
+
+from app import db
+
+class EntryChange(db.Model):
+    __tablename__ = 'entry_changes'
+    __table_args__ = (
+        db.Index('ix_entry_changes_user_op_id', 'user_id', 'op', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)  # the change sequence number
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    entry_id = db.Column(db.Integer, nullable=True)  # not known yet for entries being created
+    op = db.Column(db.String(10), nullable=False)  # "upsert", "delete"
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<EntryChange {self.id} {self.op} {self.entry_id}>'
@@ -0,0 +1,24 @@
+"""
+Revoked token model for the Serene application
+Records API tokens revoked before they expire; workers mirror the unexpired
+rows in memory so bearer authentication never has to query this table
+"""
+from datetime import datetime
+
+from app import db
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        # Workers poll for recent revocations; the sweeper purges expired rows
+        db.Index('ix_revoked_tokens_revoked_at', 'revoked_at'),
+        db.Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
+    
+    jti = db.Column(db.String(32), primary_key=True)  # token id claim
+    user_id = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)  # when the token would have expired anyway
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
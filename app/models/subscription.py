@@ -8,6 +8,10 @@ from app import db
 
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        # Used by the expiry sweeper to find lapsed subscriptions
+        db.Index('ix_subscriptions_status_period_end', 'status', 'current_period_end'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -2,6 +2,7 @@
 User model for the Serene application
 """
 from datetime import datetime, timedelta
+from flask import current_app
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -9,6 +10,10 @@ from app import db, login_manager
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Used by the expiry sweeper to find trials that have run out
+        db.Index('ix_users_trial_expiry', 'is_in_trial', 'trial_end_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
@@ -48,6 +53,11 @@ class User(UserMixin, db.Model):
         """Check if hashed password matches user password"""
         return check_password_hash(self.password_hash, password)
     
+    @property
+    def is_admin(self):
+        """Whether the user may see population-level admin views"""
+        return self.username in current_app.config['ADMIN_USERNAMES']
+    
     def to_dict(self):
         """Convert to dictionary for API responses"""
         return {
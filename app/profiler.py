@@ -0,0 +1,231 @@
+"""
+Request profiler for the Serene application
+Profiles individual requests by sampling the stack of the thread serving them
+at a fixed interval, and writes each profile as a speedscope or collapsed-stack
+(flamegraph.pl) file tagged with the route and query parameters. A request is
+profiled when an admin sends the X-Profile header, or at random at
+PROFILER_SAMPLE_RATE. Nothing is hooked into the app unless PROFILER_ENABLED
+is set, and requests that are not profiled only pay for a header lookup
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+FORMATS = ('speedscope', 'collapsed')
+
+class Profile:
+    """Stack samples of one request"""
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.samples = Counter()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def add(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        # Root first, as both output formats expect
+        stack.reverse()
+        self.samples[tuple(stack)] += 1
+
+    def collapsed(self):
+        """Samples in the collapsed-stack format read by flamegraph.pl and speedscope"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            names = ';'.join(f'{name} ({os.path.basename(filename)}:{line})' for name, filename, line in stack)
+            lines.append(f'{names} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, interval):
+        """Samples as a speedscope file, weighted in milliseconds"""
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, count in self.samples.items():
+            sample = []
+            for name, filename, line in stack:
+                key = (name, filename, line)
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({'name': name, 'file': filename, 'line': line})
+                sample.append(index[key])
+            samples.append(sample)
+            weights.append(round(count * interval * 1000, 3))
+
+        metadata = self.metadata
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': f"{metadata['method']} {metadata['path']} ({metadata['endpoint']})",
+            'exporter': 'serene',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': metadata['endpoint'] or metadata['path'],
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 3),
+                'samples': samples,
+                'weights': weights
+            }],
+            # Not part of the speedscope schema; speedscope ignores it
+            'metadata': metadata
+        }
+
+class RequestProfiler:
+    """Flask extension sampling the stacks of selected requests"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.active = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.sampler = None
+        self.pid = None
+        self.written = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILER_ENABLED', False)
+        app.config.setdefault('PROFILER_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILER_INTERVAL', 0.005)
+        app.config.setdefault('PROFILER_FORMAT', 'speedscope')
+        app.config.setdefault('PROFILER_MAX_ACTIVE', 4)
+        app.config.setdefault('PROFILE_DIR', None)
+
+        self.app = app
+        if not app.config['PROFILER_ENABLED']:
+            return
+        if app.config['PROFILER_FORMAT'] not in FORMATS:
+            raise ValueError(f"PROFILER_FORMAT must be one of {', '.join(FORMATS)}")
+
+        self.interval = float(app.config['PROFILER_INTERVAL'])
+        self.sample_rate = float(app.config['PROFILER_SAMPLE_RATE'])
+        self.max_active = int(app.config['PROFILER_MAX_ACTIVE'])
+        self.directory = app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles')
+        app.before_request(self.start)
+        app.after_request(self.record_status)
+        app.teardown_request(self.stop)
+
+    def _requested_format(self):
+        """The output format for this request, or None if it should not be profiled"""
+        header = request.headers.get(PROFILE_HEADER)
+        if header is not None:
+            # Loading the user costs a query, so it is only done when asked
+            if current_user.is_authenticated and getattr(current_user, 'is_admin', False):
+                return header if header in FORMATS else self.app.config['PROFILER_FORMAT']
+            return None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.app.config['PROFILER_FORMAT']
+        return None
+
+    def start(self):
+        """before_request hook: start sampling this thread if the request was selected"""
+        output = self._requested_format()
+        if output is None:
+            return None
+
+        with self.lock:
+            if len(self.active) >= self.max_active:
+                return None
+            self._ensure_sampler()
+            profile = Profile({
+                'endpoint': request.endpoint,
+                'rule': request.url_rule.rule if request.url_rule else None,
+                'view_args': request.view_args or {},
+                'method': request.method,
+                'path': request.path,
+                'query': request.args.to_dict(flat=False),
+                'user_id': current_user.get_id() if current_user.is_authenticated else None,
+                'started_at': datetime.utcnow().isoformat(),
+                'interval_ms': self.interval * 1000,
+                'pid': os.getpid()
+            })
+            self.active[threading.get_ident()] = profile
+        g.profile = (profile, output)
+        self.wakeup.set()
+        return None
+
+    def record_status(self, response):
+        """after_request hook: note the response status on the profile"""
+        if 'profile' in g:
+            g.profile[0].metadata['status'] = response.status_code
+        return response
+
+    def stop(self, exc=None):
+        """teardown_request hook: stop sampling and write the profile"""
+        if 'profile' not in g:
+            return
+        profile, output = g.pop('profile')
+        with self.lock:
+            self.active.pop(threading.get_ident(), None)
+        profile.duration = time.perf_counter() - profile.started
+        profile.metadata['duration_ms'] = round(profile.duration * 1000, 3)
+        profile.metadata['samples'] = sum(profile.samples.values())
+        if exc is not None:
+            profile.metadata['error'] = repr(exc)
+        try:
+            self.write(profile, output)
+        except OSError:
+            logger.exception('Failed to write request profile')
+
+    def write(self, profile, output):
+        """Write `profile` to PROFILE_DIR, returning the file path"""
+        os.makedirs(self.directory, exist_ok=True)
+        metadata = profile.metadata
+        endpoint = (metadata['endpoint'] or 'unknown').replace('.', '-')
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        base = os.path.join(self.directory, f'{stamp}-{endpoint}-{os.getpid()}')
+
+        if output == 'speedscope':
+            path = base + '.speedscope.json'
+            with open(path, 'w') as f:
+                json.dump(profile.speedscope(self.interval), f)
+        else:
+            # The collapsed format has no room for metadata, so it goes alongside
+            path = base + '.collapsed.txt'
+            with open(path, 'w') as f:
+                f.write(profile.collapsed())
+            with open(base + '.meta.json', 'w') as f:
+                json.dump(metadata, f, indent=2)
+        self.written += 1
+        return path
+
+    def _ensure_sampler(self):
+        # Threads do not survive a fork: each worker starts its own on first use
+        if self.sampler is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.sampler = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+            self.sampler.start()
+
+    def _run(self):
+        while True:
+            if not self.active:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, profile in self.active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        profile.add(frame)
+            del frames
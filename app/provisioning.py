@@ -0,0 +1,334 @@
+"""
+Bulk user provisioning for the Serene application
+Accounts are read from a CSV or JSON Lines stream and created in batches:
+each batch is validated with the registration form's rules, checked for
+taken usernames and emails with two indexed IN lookups, has its passwords
+hashed in a process pool, and is inserted together with its subscriptions in
+one transaction. Rows that cannot be created are reported with their line
+number instead of stopping the run
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from email_validator import validate_email, EmailNotValidError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models.user import User
+from app.models.subscription import Subscription
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+TRIAL_DAYS = 30
+MAX_TRIAL_DAYS = 3650
+
+PLAN_PERIODS = {
+    'monthly': timedelta(days=30),
+    'annual': timedelta(days=365),
+}
+
+def read_rows(stream, format='csv'):
+    """
+    Yield (line number, row dict or None, error or None) for each account in a
+    text stream of CSV (with a header row) or JSON Lines
+    """
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif format == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None, 'Invalid JSON'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Row must be an object'
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unknown format {format!r}')
+
+def _text(row, key):
+    value = row.get(key)
+    return value.strip() if isinstance(value, str) else value
+
+def validate_row(row, now=None):
+    """
+    Check a row against the registration form's rules and return the account
+    to create; raises ValueError describing the first problem found
+    """
+    now = now or datetime.utcnow()
+    username = _text(row, 'username')
+    email = _text(row, 'email')
+    password = row.get('password')
+    name = _text(row, 'name') or ''
+    plan = _text(row, 'plan') or None
+
+    if not isinstance(username, str) or not 3 <= len(username) <= 64:
+        raise ValueError('Username must be between 3 and 64 characters.')
+    if not isinstance(email, str) or not email or len(email) > 120:
+        raise ValueError('Please enter a valid email address.')
+    try:
+        validate_email(email, check_deliverability=False)
+    except EmailNotValidError:
+        raise ValueError('Please enter a valid email address.')
+    if not isinstance(name, str) or len(name) > 120:
+        raise ValueError('Name must be less than 120 characters.')
+    if not isinstance(password, str) or len(password) < 8:
+        raise ValueError('Password must be at least 8 characters long.')
+    if plan is not None and plan not in PLAN_PERIODS:
+        raise ValueError(f"Plan must be one of {', '.join(PLAN_PERIODS)}.")
+
+    trial_days = row.get('trial_days')
+    if trial_days in (None, ''):
+        trial_days = TRIAL_DAYS
+    try:
+        trial_days = int(trial_days)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('trial_days must be a whole number.')
+    if not 0 <= trial_days <= MAX_TRIAL_DAYS:
+        raise ValueError(f'trial_days must be between 0 and {MAX_TRIAL_DAYS}.')
+
+    return {
+        'username': username,
+        'email': email,
+        'name': name,
+        'password': password,
+        'plan': plan,
+        'trial_end_date': now + timedelta(days=trial_days)
+    }
+
+class ProvisionReport:
+    """Outcome of a provisioning run"""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.truncated = False
+
+    def fail(self, line, row, error):
+        row = row if isinstance(row, dict) else {}
+        self.errors.append({
+            'line': line,
+            'username': row.get('username'),
+            'email': row.get('email'),
+            'error': error
+        })
+
+    def to_dict(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'truncated': self.truncated,
+            'errors': sorted(self.errors, key=lambda error: error['line'])
+        }
+
+    def write_errors(self, stream):
+        """Write the per-row error report as CSV"""
+        writer = csv.DictWriter(stream, fieldnames=['line', 'username', 'email', 'error'])
+        writer.writeheader()
+        writer.writerows(sorted(self.errors, key=lambda error: error['line']))
+
+def hashing_pool(workers):
+    """Process pool for password hashing; spawned so it is safe to start from a threaded server"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+_shared_pool = None
+_shared_pool_pid = None
+_shared_pool_lock = threading.Lock()
+
+def shared_hashing_pool(workers):
+    """Hashing pool reused by every API request of this process, started on first use"""
+    global _shared_pool, _shared_pool_pid
+    with _shared_pool_lock:
+        # A forked worker cannot use its parent's pool
+        if _shared_pool is None or _shared_pool_pid != os.getpid():
+            _shared_pool = hashing_pool(workers)
+            _shared_pool_pid = os.getpid()
+        return _shared_pool
+
+def discard_shared_pool(pool):
+    """Forget a shared pool that broke (e.g. a worker was killed) so the next request starts a new one"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is pool:
+            _shared_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+class Provisioner:
+    """Creates accounts from a stream of rows in validated, hashed and batched transactions"""
+
+    def __init__(self, pool, workers, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+        self.pool = pool
+        self.workers = workers
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.report = ProvisionReport()
+        # A dry run inserts nothing, so later batches cannot see earlier ones in the database
+        self.seen_usernames = set()
+        self.seen_emails = set()
+
+    def run(self, rows, limit=None, progress=None):
+        """Provision every (line, row, error) from `rows`, stopping after `limit` rows if given"""
+        batch = []
+        processed = 0
+        for line, row, error in rows:
+            if limit is not None and processed >= limit:
+                self.report.truncated = True
+                break
+            processed += 1
+            if error is not None:
+                self.report.fail(line, row, error)
+                continue
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self._provision_batch(batch)
+                batch = []
+                if progress:
+                    progress(processed, self.report)
+        if batch:
+            self._provision_batch(batch)
+            if progress:
+                progress(processed, self.report)
+        return self.report
+
+    def _validate(self, batch, now):
+        """Valid, unique accounts of a batch as (line, account) pairs; the rest are reported"""
+        valid = []
+        usernames = set()
+        emails = set()
+        for line, row in batch:
+            try:
+                account = validate_row(row, now)
+            except ValueError as e:
+                self.report.fail(line, row, str(e))
+                continue
+            if account['username'] in usernames or account['username'] in self.seen_usernames:
+                self.report.fail(line, row, 'Duplicate username in input.')
+                continue
+            if account['email'] in emails or account['email'] in self.seen_emails:
+                self.report.fail(line, row, 'Duplicate email in input.')
+                continue
+            usernames.add(account['username'])
+            emails.add(account['email'])
+            valid.append((line, account))
+
+        # One lookup per column over the unique indexes instead of two queries per row
+        taken_usernames = set(db.session.execute(
+            select(User.username).where(User.username.in_(usernames))
+        ).scalars()) if usernames else set()
+        taken_emails = set(db.session.execute(
+            select(User.email).where(User.email.in_(emails))
+        ).scalars()) if emails else set()
+
+        available = []
+        for line, account in valid:
+            if account['username'] in taken_usernames:
+                self.report.fail(line, account, 'Username is already taken.')
+            elif account['email'] in taken_emails:
+                self.report.fail(line, account, 'Email is already registered.')
+            else:
+                available.append((line, account))
+        if self.dry_run:
+            self.seen_usernames.update(account['username'] for _, account in available)
+            self.seen_emails.update(account['email'] for _, account in available)
+        return available
+
+    def _provision_batch(self, batch):
+        now = datetime.utcnow()
+        accounts = self._validate(batch, now)
+        db.session.commit()
+        if self.dry_run:
+            # Counts the accounts that would be created
+            self.report.created += len(accounts)
+            return
+        if not accounts:
+            return
+
+        passwords = [account['password'] for _, account in accounts]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        hashes = list(self.pool.map(generate_password_hash, passwords, chunksize=chunksize))
+        for (_, account), password_hash in zip(accounts, hashes):
+            account['password_hash'] = password_hash
+
+        try:
+            self._insert(accounts, now)
+            db.session.commit()
+            self.report.created += len(accounts)
+        except IntegrityError:
+            # Someone registered one of these names since the lookup; retry row by row
+            db.session.rollback()
+            for line, account in accounts:
+                try:
+                    self._insert([(line, account)], now)
+                    db.session.commit()
+                    self.report.created += 1
+                except IntegrityError:
+                    db.session.rollback()
+                    self.report.fail(line, account, 'Username or email is already taken.')
+
+    def _insert(self, accounts, now):
+        """Insert users and the subscriptions of those on a plan, without committing"""
+        user_rows = [
+            {
+                'username': account['username'],
+                'email': account['email'],
+                'name': account['name'],
+                'password_hash': account['password_hash'],
+                'is_subscribed': account['plan'] is not None,
+                'is_in_trial': account['plan'] is None,
+                'trial_end_date': account['trial_end_date'],
+                'created_at': now
+            }
+            for _, account in accounts
+        ]
+        ids = dict(db.session.execute(
+            insert(User).returning(User.username, User.id), user_rows
+        ).all())
+
+        subscription_rows = [
+            {
+                'user_id': ids[account['username']],
+                'status': 'active',
+                'plan': account['plan'],
+                'current_period_start': now,
+                'current_period_end': now + PLAN_PERIODS[account['plan']],
+                'created_at': now
+            }
+            for _, account in accounts if account['plan'] is not None
+        ]
+        if subscription_rows:
+            db.session.execute(insert(Subscription), subscription_rows)
+
+def provision_stream(stream, format='csv', batch_size=DEFAULT_BATCH_SIZE, workers=None,
+                     dry_run=False, limit=None, progress=None, pool=None):
+    """
+    Provision the accounts in a text stream, returning a ProvisionReport
+    Hashes in `pool` if given, otherwise in a pool of `workers` processes started for the run
+    """
+    workers = workers or os.cpu_count() or 1
+    if pool is not None:
+        provisioner = Provisioner(pool, workers, batch_size=batch_size, dry_run=dry_run)
+        return provisioner.run(read_rows(stream, format), limit=limit, progress=progress)
+    with hashing_pool(workers) as pool:
+        provisioner = Provisioner(pool, workers, batch_size=batch_size, dry_run=dry_run)
+        return provisioner.run(read_rows(stream, format), limit=limit, progress=progress)
+
+def text_stream(binary):
+    """Decode a binary upload stream as UTF-8 text without reading it all"""
+    if not isinstance(binary, io.BufferedIOBase):
+        binary = io.BufferedReader(binary)
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
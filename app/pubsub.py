@@ -0,0 +1,161 @@
+"""
+Publish/subscribe for live journal updates in the Serene application
+Entry changes are pushed to every open stream of the same user. By default
+events stay inside the worker process; set PUBSUB_URL to a Redis server so
+events reach streams held by the other workers as well. Streams served by the
+async API are fed through an asyncio queue, so they hold no thread while idle
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """Queue of events for one open stream"""
+
+    def __init__(self, broker, user_id, max_pending=100):
+        self.broker = broker
+        self.user_id = user_id
+        self.events = queue.Queue(maxsize=max_pending)
+
+    def push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # A stalled client gets a single resync request instead of an unbounded backlog
+            self.discard_pending()
+            try:
+                self.events.put_nowait({'type': 'resync'})
+            except queue.Full:
+                pass
+
+    def discard_pending(self):
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def get(self, timeout):
+        """Next event, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class AsyncSubscription(Subscription):
+    """Queue of events for one stream served from an asyncio event loop"""
+
+    def __init__(self, broker, user_id, loop, max_pending=100):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = loop
+        self.events = asyncio.Queue(maxsize=max_pending)
+
+    def push(self, event):
+        # Publishers run on other threads; the queue may only be touched from its loop
+        try:
+            self.loop.call_soon_threadsafe(self._push, event)
+        except RuntimeError:
+            # The loop has shut down; the stream is gone
+            pass
+
+    def _push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except asyncio.QueueFull:
+            self.discard_pending()
+            self.events.put_nowait({'type': 'resync'})
+
+    def discard_pending(self):
+        while not self.events.empty():
+            self.events.get_nowait()
+
+    async def get(self, timeout):
+        """Next event, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EntryEventBroker:
+    """Flask extension fanning entry events out to the streams of their owner"""
+
+    CHANNEL_PREFIX = 'serene:entries:'
+
+    def __init__(self, app=None):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.redis = None
+        self.listener = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PUBSUB_URL', None)
+        if app.config['PUBSUB_URL']:
+            import redis
+            self.redis = redis.Redis.from_url(app.config['PUBSUB_URL'])
+
+    def subscribe(self, user_id, loop=None):
+        """Open a subscription to the events of `user_id`, read from `loop` if given"""
+        subscription = AsyncSubscription(self, user_id, loop) if loop is not None else Subscription(self, user_id)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscription)
+            # Started lazily so a preloading master never owns the listener thread
+            if self.redis is not None and self.listener is None:
+                self.listener = threading.Thread(target=self._listen, name='entry-events', daemon=True)
+                self.listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscribers[subscription.user_id]
+
+    def publish(self, user_id, event_type, data):
+        """
+        Send an event to every stream of `user_id`
+        Called after the change is committed, so a broker failure is logged
+        rather than raised; streams that miss the event catch up on reconnect
+        """
+        event = {'type': event_type, 'data': data}
+        try:
+            if self.redis is not None:
+                self.redis.publish(f'{self.CHANNEL_PREFIX}{user_id}', json.dumps(event))
+            else:
+                self._dispatch(user_id, event)
+        except Exception:
+            logger.exception('Failed to publish %s event for user %s', event_type, user_id)
+            return False
+        return True
+
+    def _dispatch(self, user_id, event):
+        with self.lock:
+            subscriptions = list(self.subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def _listen(self):
+        """Relay events published by any worker to the local subscribers"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{self.CHANNEL_PREFIX}*')
+                for message in pubsub.listen():
+                    channel = message['channel'].decode('utf-8')
+                    user_id = int(channel[len(self.CHANNEL_PREFIX):])
+                    self._dispatch(user_id, json.loads(message['data']))
+            except Exception:
+                logger.exception('Entry event listener lost its broker connection, retrying')
+                time.sleep(1)
@@ -0,0 +1,127 @@
+"""
+Bulk sentiment re-scoring for the Serene application
+Recomputes stale Entry.sentiment values after the lexicon changes, walking the
+entries table in keyset order and scoring each chunk in a process pool
+"""
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select, update, bindparam, and_
+
+from app import db
+from app.models.entry import Entry, allocate_change
+from app.models.user import User
+from app.utils import analyze_sentiment, sentiment_version
+
+DEFAULT_CHUNK_SIZE = 500
+
+def load_checkpoint(path):
+    """Return the id to resume after, or 0 when there is no checkpoint for the current lexicon"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('version') != sentiment_version():
+        return 0
+    return checkpoint.get('last_id', 0)
+
+def save_checkpoint(path, last_id, updated):
+    """Atomically record progress so an interrupted run can resume"""
+    if not path:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': sentiment_version(), 'last_id': last_id, 'updated': updated}, f)
+    os.replace(tmp_path, path)
+
+def _is_stale(table):
+    # Client-supplied sentiments have no version and are never replaced
+    return and_(table.c.sentiment_version.is_not(None), table.c.sentiment_version != sentiment_version())
+
+def _write_chunk(write, sentiments):
+    """
+    Store new sentiments by entry id, giving each rescored entry a new change
+    sequence so delta sync clients fetch it; returns the number written
+    """
+    table = Entry.__table__
+    owners = db.session.execute(
+        select(table.c.user_id).where(table.c.id.in_(sentiments)).distinct()
+    ).scalars().all()
+    # Lock the owners as the before_flush hook does, so sequence numbers
+    # commit in order with the app's own writes
+    db.session.execute(
+        select(User.id).where(User.id.in_(owners)).order_by(User.id).with_for_update()
+    )
+    # Rows edited since they were read were rescored by the app already
+    stale = db.session.execute(
+        select(table.c.id, table.c.user_id).where(table.c.id.in_(sentiments), _is_stale(table))
+    ).all()
+    if stale:
+        db.session.execute(write, [
+            {
+                'entry_id': row.id,
+                'new_sentiment': sentiments[row.id],
+                'new_change_seq': allocate_change(db.session, row.user_id, row.id, 'upsert')
+            }
+            for row in stale
+        ])
+    db.session.commit()
+    return len(stale)
+
+def rescore_entries(chunk_size=DEFAULT_CHUNK_SIZE, workers=None, checkpoint_path=None,
+                    max_rows_per_second=None, pause=0, progress=None):
+    """
+    Rescore every server-scored entry not yet scored with the current lexicon version
+    Returns the number of entries updated by this run
+    """
+    table = Entry.__table__
+    last_id = load_checkpoint(checkpoint_path)
+    updated = 0
+
+    write = (
+        update(table)
+        .where(table.c.id == bindparam('entry_id'))
+        .values(sentiment=bindparam('new_sentiment'), sentiment_version=sentiment_version(),
+                change_seq=bindparam('new_change_seq'))
+    )
+
+    workers = workers or os.cpu_count() or 1
+    # Spawned workers only need the pure scoring function, never the app's connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        while True:
+            started = time.monotonic()
+            rows = db.session.execute(
+                select(table.c.id, table.c.journal_entry)
+                .where(table.c.id > last_id, _is_stale(table))
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).all()
+            # End the read transaction so no snapshot is held while scoring
+            db.session.commit()
+            if not rows:
+                break
+
+            texts = [row.journal_entry for row in rows]
+            batch = math.ceil(len(texts) / (workers * 4))
+            sentiments = pool.map(analyze_sentiment, texts, chunksize=batch)
+
+            updated += _write_chunk(write, dict(zip((row.id for row in rows), sentiments)))
+
+            last_id = rows[-1].id
+            save_checkpoint(checkpoint_path, last_id, updated)
+            if progress:
+                progress(last_id, updated)
+
+            # Throttle so production traffic keeps its share of the database
+            delay = pause
+            if max_rows_per_second:
+                delay = max(delay, len(rows) / max_rows_per_second - (time.monotonic() - started))
+            if delay > 0:
+                time.sleep(delay)
+
+    return updated
@@ -0,0 +1,134 @@
+"""
+Admin routes for the Serene application
+Population-level analytics, served from the columnar snapshot rather than
+the entries table, access to request profiles, and bulk account provisioning
+"""
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
+from datetime import date, datetime
+
+from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask_login import login_required, current_user
+
+from app.analytics import Snapshot, mood_distribution, sentiment_by_weekday, summary
+from app.provisioning import (provision_stream, text_stream, shared_hashing_pool, discard_shared_pool,
+                              DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE)
+
+# Create a blueprint for admin routes
+admin = Blueprint('admin', __name__)
+
+# One provisioning upload at a time per process, so uploads cannot pile up hashing work
+_provision_lock = threading.Lock()
+
+def admin_required(view):
+    """Allow only logged-in admins through to the view"""
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapped
+
+def _date_arg(name):
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+@admin.route('/api/admin/analytics/summary')
+@admin_required
+def analytics_summary():
+    """Size and freshness of the analytics snapshot"""
+    return jsonify(summary(Snapshot()))
+
+@admin.route('/api/admin/analytics/moods')
+@admin_required
+def analytics_moods():
+    """Mood distribution across all users per day, week or month"""
+    period = request.args.get('period', 'week')
+    if period not in ('day', 'week', 'month'):
+        return jsonify({'error': 'period must be day, week or month'}), 400
+    try:
+        start, end = _date_arg('start'), _date_arg('end')
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    
+    return jsonify({'period': period, 'results': mood_distribution(Snapshot(), period, start, end)})
+
+@admin.route('/api/admin/analytics/sentiment-by-weekday')
+@admin_required
+def analytics_sentiment_by_weekday():
+    """Sentiment mix of entries written on each day of the week"""
+    try:
+        start, end = _date_arg('start'), _date_arg('end')
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    
+    return jsonify({'results': sentiment_by_weekday(Snapshot(), start, end)})
+
+
+def _profile_dir():
+    return current_app.config.get('PROFILE_DIR') or os.path.join(current_app.instance_path, 'profiles')
+
+@admin.route('/api/admin/profiles')
+@admin_required
+def profiles():
+    """Request profiles written on this host, newest first"""
+    directory = _profile_dir()
+    names = sorted(os.listdir(directory), reverse=True) if os.path.isdir(directory) else []
+    
+    results = []
+    for name in names[:request.args.get('limit', 100, type=int)]:
+        stat = os.stat(os.path.join(directory, name))
+        results.append({
+            'name': name,
+            'size': stat.st_size,
+            'created_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+        })
+    return jsonify({'results': results})
+
+@admin.route('/api/admin/profiles/<name>')
+@admin_required
+def profile_file(name):
+    """Download one request profile"""
+    return send_from_directory(_profile_dir(), name, as_attachment=True)
+
+@admin.route('/api/admin/users/provision', methods=['POST'])
+@admin_required
+def provision_users():
+    """Create accounts from an uploaded CSV or JSON Lines body"""
+    mimetype = request.mimetype
+    if mimetype == 'text/csv':
+        format = 'csv'
+    elif mimetype in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        format = 'jsonl'
+    else:
+        return jsonify({'error': 'Send text/csv or application/x-ndjson'}), 415
+    
+    dry_run = request.args.get('dry_run') == '1'
+    batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        return jsonify({'error': f'batch_size must be between 1 and {MAX_BATCH_SIZE}'}), 400
+    
+    if not _provision_lock.acquire(blocking=False):
+        return jsonify({'error': 'A provisioning run is already in progress, try again later'}), 503, {'Retry-After': '30'}
+    try:
+        workers = current_app.config['PROVISION_WORKERS']
+        pool = shared_hashing_pool(workers)
+        # Rows are read from the request body as they are processed
+        report = provision_stream(
+            text_stream(request.stream),
+            format,
+            batch_size=batch_size,
+            workers=workers,
+            dry_run=dry_run,
+            limit=current_app.config['PROVISION_API_MAX_ROWS'],
+            pool=pool
+        )
+    except BrokenProcessPool:
+        discard_shared_pool(pool)
+        return jsonify({'error': 'Password hashing failed, try again'}), 503
+    finally:
+        _provision_lock.release()
+    return jsonify(dict(report.to_dict(), dry_run=dry_run))
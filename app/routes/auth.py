@@ -5,7 +5,7 @@ from flask import Blueprint, render_template, flash, redirect, url_for, request,
 from flask_login import login_user, logout_user, login_required, current_user
 from datetime import datetime, timedelta
 
-from app import db
+from app import db, csrf, limiter, token_auth
 from app.models.user import User
 from app.forms.auth import LoginForm, RegistrationForm
 
@@ -13,6 +13,7 @@ from app.forms.auth import LoginForm, RegistrationForm
 auth = Blueprint('auth', __name__)
 
 @auth.route('/login', methods=['GET', 'POST'])
+@limiter.limit('login')
 def login():
     """Handle user login"""
     # Redirect if user is already logged in
@@ -36,6 +37,7 @@ def login():
     return render_template('auth/login.html', form=form, title='Login')
 
 @auth.route('/register', methods=['GET', 'POST'])
+@limiter.limit('register')
 def register():
     """Handle user registration"""
     # Redirect if user is already logged in
@@ -71,6 +73,7 @@ def logout():
 
 # API Routes
 @auth.route('/api/register', methods=['POST'])
+@limiter.limit('register')
 def api_register():
     """API endpoint for user registration"""
     data = request.get_json()
@@ -103,6 +106,7 @@ def api_register():
     return jsonify(user.to_dict()), 201
 
 @auth.route('/api/login', methods=['POST'])
+@limiter.limit('login')
 def api_login():
     """API endpoint for user login"""
     data = request.get_json()
@@ -130,4 +134,55 @@ def api_logout():
 @login_required
 def api_user():
     """API endpoint to get current user info"""
-    return jsonify(current_user.to_dict())
\ No newline at end of file
+    return jsonify(current_user.to_dict())
+
+@auth.route('/api/token', methods=['POST'])
+@csrf.exempt
+@limiter.limit('login')
+def api_token():
+    """API endpoint issuing a bearer access token and refresh token"""
+    data = request.get_json()
+    
+    if not data or not all(key in data for key in ('username', 'password')):
+        return jsonify({'error': 'Missing username or password'}), 400
+    
+    user = User.query.filter_by(username=data['username']).first()
+    
+    if not user or not user.verify_password(data['password']):
+        return jsonify({'error': 'Invalid username or password'}), 401
+    
+    return jsonify(token_auth.issue(user))
+
+@auth.route('/api/token/refresh', methods=['POST'])
+@csrf.exempt
+def api_token_refresh():
+    """API endpoint exchanging a refresh token for a new token pair"""
+    data = request.get_json()
+    
+    claims = token_auth.verify_refresh((data or {}).get('refresh_token', ''))
+    if claims is None:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    
+    user = User.query.get(claims['sub'])
+    if user is None:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    
+    # Refresh tokens are single use; losing this race means the token was replayed
+    if not token_auth.revoke(claims):
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    
+    return jsonify(token_auth.issue(user))
+
+@auth.route('/api/token/revoke', methods=['POST'])
+@csrf.exempt
+def api_token_revoke():
+    """API endpoint revoking an access or refresh token before it expires"""
+    data = request.get_json()
+    token = (data or {}).get('token', '')
+    
+    claims = token_auth.verify_access(token) or token_auth.verify_refresh(token)
+    if claims is not None:
+        token_auth.revoke(claims)
+    
+    # Unknown, expired and already revoked tokens are not an error
+    return jsonify({'success': True})
\ No newline at end of file
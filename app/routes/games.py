@@ -3,12 +3,16 @@ Games and activities routes for the Serene application
 """
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify
 from flask_login import login_required, current_user
+from datetime import datetime
 
-from app import db
+from app import db, activity_buffer
+from app.ingest import parse_event
 
 # Create a blueprint for games routes
 games = Blueprint('games', __name__)
 
+MAX_EVENTS_PER_BATCH = 500
+
 @games.route('/games')
 @login_required
 def games_page():
@@ -49,4 +53,33 @@ def gratitude():
 @login_required
 def affirmations():
     """Positive affirmations activity"""
-    return render_template('games/affirmations.html', title='Positive Affirmations')
\ No newline at end of file
+    return render_template('games/affirmations.html', title='Positive Affirmations')
+
+@games.route('/api/activity-events', methods=['POST'])
+@login_required
+def record_activity_events():
+    """Accept a batch of activity events; they are written to the database shortly after"""
+    data = request.get_json(silent=True)
+    
+    if not isinstance(data, dict) or not isinstance(data.get('events'), list):
+        return jsonify({'error': 'Missing events'}), 400
+    
+    if len(data['events']) > MAX_EVENTS_PER_BATCH:
+        return jsonify({'error': f'At most {MAX_EVENTS_PER_BATCH} events per batch'}), 400
+    
+    now = datetime.utcnow()
+    rows = []
+    rejected = []
+    for index, event in enumerate(data['events']):
+        try:
+            rows.append(parse_event(event, current_user.id, now))
+        except ValueError as e:
+            rejected.append({'index': index, 'error': str(e)})
+    
+    if rows and not activity_buffer.add(rows):
+        # The buffer only fills up while the database is unavailable; the client keeps its events
+        response = jsonify({'error': 'Event buffer is full, please retry later'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    return jsonify({'accepted': len(rows), 'rejected': rejected}), 202
\ No newline at end of file
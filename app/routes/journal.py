@@ -1,20 +1,35 @@
 """
 Journal routes for the Serene application
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, Response, abort, current_app, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 import json
 import re
+import threading
+import time
 
-from app import db
+from app import db, limiter, sentiment_cache, entry_events
 from app.models.entry import Entry
 from app.forms.journal import JournalEntryForm
-from app.utils import analyze_sentiment, get_date_range
+from app.archive import get_entries_between, get_archived_entry, restore_entry
+from app.utils import get_date_range, sentiment_version, is_stale_sentiment
 
 # Create a blueprint for journal routes
 journal = Blueprint('journal', __name__)
 
+# Seconds between keep-alive comments and before a stream is closed for the client to reconnect
+STREAM_KEEPALIVE = 15
+STREAM_MAX_AGE = 300
+
+# Each stream served here holds a worker thread for its whole life, so only a
+# few may be open per process; the async API (asgi.py) serves them without threads
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+# Most entries GET /api/entries returns at once
+MAX_ENTRIES_PER_PAGE = 500
+
 @journal.route('/journal')
 @login_required
 def journal_page():
@@ -37,20 +52,12 @@ def journal_page():
     date_start = datetime(selected_date.year, selected_date.month, selected_date.day, 0, 0, 0)
     date_end = datetime(selected_date.year, selected_date.month, selected_date.day, 23, 59, 59)
     
-    # Get entries for the selected day
-    entries = Entry.query.filter(
-        Entry.user_id == current_user.id,
-        Entry.date >= date_start,
-        Entry.date <= date_end
-    ).order_by(Entry.date.desc()).all()
+    # Get entries for the selected day (older days may be archived)
+    entries = get_entries_between(current_user.id, date_start, date_end)
     
     # Get entries for the past month for the calendar view
     start_date, end_date = get_date_range(days=30)
-    month_entries = Entry.query.filter(
-        Entry.user_id == current_user.id,
-        Entry.date >= start_date,
-        Entry.date <= end_date
-    ).all()
+    month_entries = get_entries_between(current_user.id, start_date, end_date)
     
     # Group entries by date for calendar
     calendar_data = {}
@@ -70,6 +77,7 @@ def journal_page():
 
 @journal.route('/api/analyze-sentiment', methods=['POST'])
 @login_required
+@limiter.limit('sentiment')
 def api_analyze_sentiment():
     """API endpoint for analyzing sentiment of text"""
     data = request.get_json()
@@ -77,9 +85,9 @@ def api_analyze_sentiment():
     if not data or 'text' not in data:
         return jsonify({'error': 'No text provided'}), 400
     
-    sentiment = analyze_sentiment(data['text'])
+    result = sentiment_cache.score(data['text'])
     
-    return jsonify({'sentiment': sentiment})
+    return jsonify({'sentiment': result.label, 'score': result.score})
 
 @journal.route('/api/entries', methods=['POST'])
 @login_required
@@ -92,8 +100,10 @@ def create_entry():
     
     # Analyze sentiment if not provided
     sentiment = data.get('sentiment')
+    version = None
     if not sentiment:
-        sentiment = analyze_sentiment(data['journal_entry'])
+        sentiment = sentiment_cache.analyze(data['journal_entry'])
+        version = sentiment_version()
     
     # Create the entry
     entry = Entry(
@@ -101,19 +111,86 @@ def create_entry():
         date=datetime.utcnow(),
         mood=data['mood'],
         journal_entry=data['journal_entry'],
-        sentiment=sentiment
+        sentiment=sentiment,
+        sentiment_version=version
     )
     
     db.session.add(entry)
     db.session.commit()
     
+    entry_events.publish(current_user.id, 'created', entry.to_dict())
+    
     return jsonify(entry.to_dict()), 201
 
+@journal.route('/api/entries', methods=['GET'])
+@login_required
+def list_entries():
+    """API endpoint listing the current user's entries, newest first"""
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if 'start' in request.args else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if 'end' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    limit = request.args.get('limit', 100, type=int)
+    if not 1 <= limit <= MAX_ENTRIES_PER_PAGE:
+        return jsonify({'error': f'limit must be between 1 and {MAX_ENTRIES_PER_PAGE}'}), 400
+    
+    # Defaults to the same 30 days the calendar shows; archived entries are included
+    if start is None or end is None:
+        default_start, default_end = get_date_range(days=30)
+        start = start or default_start
+        end = end or default_end
+    end = end.replace(hour=23, minute=59, second=59)
+    
+    entries = get_entries_between(current_user.id, start, end)[:limit]
+    return jsonify([entry.to_dict() for entry in entries])
+
+@journal.route('/api/entries/stream')
+@login_required
+def stream_entries():
+    """Server-Sent Events stream of the current user's entry changes"""
+    global _open_streams
+    user_id = current_user.id
+    
+    with _streams_lock:
+        if _open_streams >= current_app.config['STREAM_MAX_OPEN']:
+            return jsonify({'error': 'Too many live streams open, try again later'}), 503, {'Retry-After': '30'}
+        _open_streams += 1
+    
+    def release():
+        global _open_streams
+        with _streams_lock:
+            _open_streams -= 1
+    
+    def generate():
+        subscription = entry_events.subscribe(user_id)
+        try:
+            yield 'retry: 3000\n\n'
+            opened = time.monotonic()
+            while time.monotonic() - opened < STREAM_MAX_AGE:
+                event = subscription.get(timeout=STREAM_KEEPALIVE)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event.get('data'))}\n\n"
+        finally:
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(release)
+    return response
+
 @journal.route('/entries/<int:entry_id>', methods=['GET'])
 @login_required
 def view_entry(entry_id):
     """View a specific journal entry"""
-    entry = Entry.query.get_or_404(entry_id)
+    entry = Entry.query.get(entry_id) or get_archived_entry(entry_id, current_user.id)
+    if entry is None:
+        abort(404)
     
     # Security check
     if entry.user_id != current_user.id:
@@ -126,7 +203,15 @@ def view_entry(entry_id):
 @login_required
 def edit_entry(entry_id):
     """Edit a journal entry"""
-    entry = Entry.query.get_or_404(entry_id)
+    entry = Entry.query.get(entry_id)
+    if entry is None:
+        # Archived entries move back to the hot table only when they are changed
+        if request.method == 'POST':
+            entry = restore_entry(entry_id, current_user.id)
+        else:
+            entry = get_archived_entry(entry_id, current_user.id)
+        if entry is None:
+            abort(404)
     
     # Security check
     if entry.user_id != current_user.id:
@@ -140,12 +225,19 @@ def edit_entry(entry_id):
         form.journal_entry.data = entry.journal_entry
     
     if form.validate_on_submit():
+        # Only rescore when the text or the lexicon has changed
+        if (entry.journal_entry != form.journal_entry.data
+                or is_stale_sentiment(entry.sentiment_version)):
+            entry.sentiment = sentiment_cache.analyze(form.journal_entry.data)
+            entry.sentiment_version = sentiment_version()
+        
         entry.mood = form.mood.data
         entry.journal_entry = form.journal_entry.data
-        entry.sentiment = analyze_sentiment(form.journal_entry.data)
         
         db.session.commit()
         
+        entry_events.publish(current_user.id, 'updated', entry.to_dict())
+        
         flash('Journal entry updated successfully.', 'success')
         return redirect(url_for('journal.view_entry', entry_id=entry.id))
     
@@ -155,7 +247,9 @@ def edit_entry(entry_id):
 @login_required
 def delete_entry(entry_id):
     """Delete a journal entry"""
-    entry = Entry.query.get_or_404(entry_id)
+    entry = Entry.query.get(entry_id) or restore_entry(entry_id, current_user.id)
+    if entry is None:
+        abort(404)
     
     # Security check
     if entry.user_id != current_user.id:
@@ -165,5 +259,7 @@ def delete_entry(entry_id):
     db.session.delete(entry)
     db.session.commit()
     
+    entry_events.publish(current_user.id, 'deleted', {'id': entry_id})
+    
     flash('Journal entry deleted successfully.', 'success')
     return redirect(url_for('journal.journal_page'))
\ No newline at end of file
@@ -5,8 +5,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
 from datetime import datetime
 
-from app import db
-from app.models.entry import Entry
+from app.archive import get_recent_entries, count_moods
 
 # Create a blueprint for main routes
 main = Blueprint('main', __name__)
@@ -22,20 +21,11 @@ def index():
 @login_required
 def dashboard():
     """Dashboard page with overall metrics and visualizations"""
-    # Get recent entries
-    recent_entries = Entry.query.filter_by(user_id=current_user.id) \
-                               .order_by(Entry.date.desc()) \
-                               .limit(5) \
-                               .all()
+    # Get recent entries (older ones may be archived)
+    recent_entries = get_recent_entries(current_user.id, 5)
     
-    # Count entries by mood
-    mood_counts = db.session.query(Entry.mood, db.func.count(Entry.id)) \
-                            .filter(Entry.user_id == current_user.id) \
-                            .group_by(Entry.mood) \
-                            .all()
-    
-    # Format for chart
-    mood_data = {mood: count for mood, count in mood_counts}
+    # Count entries by mood, archived ones included, for the chart
+    mood_data = count_moods(current_user.id)
     
     # Check subscription status
     is_subscribed = current_user.is_subscribed
@@ -0,0 +1,218 @@
+"""
+Delta sync routes for the Serene application
+Offline-capable clients fetch only the entry changes since their last change
+token and push batches of local writes in a single transaction
+"""
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
+from itsdangerous import URLSafeSerializer, BadSignature
+from datetime import datetime
+import time
+
+from app import db, sentiment_cache, entry_events
+from app.models.entry import Entry
+from app.models.entry_change import EntryChange
+from app.archive import get_archived_changes, get_archived_entry, restore_entry
+from app.utils import sentiment_version, is_stale_sentiment
+
+# Create a blueprint for sync routes
+sync = Blueprint('sync', __name__)
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 500
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='entry-sync')
+
+def make_token(user_id, seq):
+    """Opaque change token for a user's position in the change sequence"""
+    return _serializer().dumps({'u': user_id, 's': seq, 't': int(time.time())})
+
+def read_token(token, user_id):
+    """
+    Return the (sequence number, issue time) in `token`, or None if it is
+    invalid or belongs to another user
+    """
+    try:
+        data = _serializer().loads(token)
+    except BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get('u') != user_id:
+        return None
+    # Tokens issued before they carried a time count as old
+    return data.get('s'), data.get('t', 0)
+
+def _is_seq(value):
+    """Whether `value` is a non-negative integer the database can store"""
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < 2 ** 63
+
+def _change_error(change):
+    """Why a pushed change is malformed, or None if it can be applied"""
+    if not isinstance(change, dict):
+        return 'Change must be an object'
+    op = change.get('op')
+    if op == 'create':
+        if not change.get('mood') or not change.get('journal_entry'):
+            return 'Missing required fields'
+        if not isinstance(change['mood'], str) or not isinstance(change['journal_entry'], str):
+            return 'mood and journal_entry must be strings'
+    elif op in ('update', 'delete'):
+        if not _is_seq(change.get('id')):
+            return 'id must be an integer'
+        if change.get('base_seq') is not None and not _is_seq(change['base_seq']):
+            return 'base_seq must be an integer'
+        for field in ('mood', 'journal_entry'):
+            if field in change and not (isinstance(change[field], str) and change[field]):
+                return f'{field} must be a non-empty string'
+    else:
+        return 'Unknown op'
+    return None
+
+@sync.route('/api/sync', methods=['GET'])
+@login_required
+def get_changes():
+    """Return the current user's entry changes since the `since` token"""
+    since = 0
+    token = request.args.get('since')
+    if token:
+        data = read_token(token, current_user.id)
+        if data is None or not isinstance(data[0], int):
+            return jsonify({'error': 'Invalid sync token'}), 400
+        since, issued = data
+        # Deletes older than the tombstone retention may have been pruned
+        if issued < time.time() - current_app.config['SYNC_TOMBSTONE_DAYS'] * 86400:
+            return jsonify({'error': 'Sync token expired, sync again without a token'}), 410
+
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+
+    upserts = Entry.query.filter(
+        Entry.user_id == current_user.id,
+        Entry.change_seq > since
+    ).order_by(Entry.change_seq).limit(limit + 1).all()
+
+    deletes = EntryChange.query.filter(
+        EntryChange.user_id == current_user.id,
+        EntryChange.op == 'delete',
+        EntryChange.id > since
+    ).order_by(EntryChange.id).limit(limit + 1).all()
+
+    # Archived entries still exist for the client; include those changed since the token
+    upserts += [entry for entry in get_archived_changes(current_user.id, since)
+                if getattr(entry, 'change_seq', None)]
+
+    changes = [{'op': 'upsert', 'seq': entry.change_seq, 'entry': entry.to_dict()} for entry in upserts]
+    changes += [{'op': 'delete', 'seq': change.id, 'id': change.entry_id} for change in deletes]
+    changes.sort(key=lambda change: change['seq'])
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Entries written before change tracking existed have no sequence yet; a
+    # full sync (no token) includes them so the client starts complete
+    if not token:
+        legacy = Entry.query.filter(
+            Entry.user_id == current_user.id,
+            Entry.change_seq.is_(None)
+        ).order_by(Entry.id).all()
+        legacy += [entry for entry in get_archived_changes(current_user.id)
+                   if not getattr(entry, 'change_seq', None)]
+        changes = [{'op': 'upsert', 'seq': 0, 'entry': entry.to_dict()} for entry in legacy] + changes
+
+    last_seq = changes[-1]['seq'] if changes else since
+
+    return jsonify({
+        'changes': changes,
+        'next': make_token(current_user.id, last_seq),
+        'has_more': has_more
+    })
+
+@sync.route('/api/sync', methods=['POST'])
+@login_required
+def push_changes():
+    """Apply a batch of client writes in one transaction, reporting conflicts per write"""
+    data = request.get_json()
+
+    if not isinstance(data, dict) or not isinstance(data.get('changes'), list):
+        return jsonify({'error': 'Missing changes'}), 400
+
+    if len(data['changes']) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} changes per batch'}), 400
+
+    errors = [_change_error(change) for change in data['changes']]
+    
+    # Load every entry the batch touches in one query
+    entry_ids = {change['id'] for change, error in zip(data['changes'], errors)
+                 if error is None and change['op'] in ('update', 'delete')}
+    entries = {}
+    if entry_ids:
+        entries = {entry.id: entry for entry in Entry.query.filter(
+            Entry.user_id == current_user.id,
+            Entry.id.in_(entry_ids)
+        )}
+    
+    results = []
+    applied = []
+    for index, (change, error) in enumerate(zip(data['changes'], errors)):
+        result = {'index': index, 'client_id': change.get('client_id') if isinstance(change, dict) else None}
+        results.append(result)
+        if error is not None:
+            result.update(status='error', error=error)
+            continue
+        op = change['op']
+
+        if op == 'create':
+            entry = Entry(user_id=current_user.id, mood=change['mood'], journal_entry=change['journal_entry'])
+            if change.get('date'):
+                try:
+                    entry.date = datetime.fromisoformat(change['date'])
+                except (TypeError, ValueError):
+                    result.update(status='error', error='Invalid date')
+                    continue
+            db.session.add(entry)
+        else:
+            entry = entries.get(change['id'])
+            current = entry
+            if entry is None:
+                current = get_archived_entry(change['id'], current_user.id)
+                if current is None:
+                    result.update(status='conflict', reason='deleted')
+                    continue
+            # The client must have seen the latest server version of the entry
+            seq = getattr(current, 'change_seq', None)
+            if seq is not None and seq > (change.get('base_seq') or 0):
+                result.update(status='conflict', reason='modified', entry=current.to_dict())
+                continue
+            if entry is None:
+                # Archived entries move back to the hot table to be edited or deleted
+                entry = restore_entry(current.id, current_user.id)
+                entries[entry.id] = entry
+            if op == 'delete':
+                db.session.delete(entry)
+                del entries[entry.id]
+                result.update(status='applied', id=entry.id)
+                applied.append(('deleted', entry, result))
+                continue
+            if 'mood' in change:
+                entry.mood = change['mood']
+            if 'journal_entry' in change:
+                entry.journal_entry = change['journal_entry']
+
+        if op == 'create' or 'journal_entry' in change or is_stale_sentiment(entry.sentiment_version):
+            entry.sentiment = sentiment_cache.analyze(entry.journal_entry)
+            entry.sentiment_version = sentiment_version()
+        result['status'] = 'applied'
+        applied.append(('created' if op == 'create' else 'updated', entry, result))
+
+    db.session.commit()
+
+    for event_type, entry, result in applied:
+        if event_type == 'deleted':
+            entry_events.publish(current_user.id, 'deleted', {'id': entry.id})
+        else:
+            result['entry'] = entry.to_dict()
+            entry_events.publish(current_user.id, event_type, result['entry'])
+
+    return jsonify({'results': results})
@@ -0,0 +1,139 @@
+"""
+Online schema change helpers for the Serene application's migrations
+Lets migrations add columns and indexes to large tables without holding long
+locks, and run data backfills in throttled, resumable chunks that report
+progress and an estimated time remaining
+"""
+import logging
+import os
+import time
+
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger('alembic.runtime.schema')
+
+# Bound how long DDL may wait for a lock before failing (PostgreSQL), so a
+# migration never queues live traffic behind a long-running transaction
+LOCK_TIMEOUT = os.environ.get('MIGRATION_LOCK_TIMEOUT', '5s')
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+def has_table(table):
+    return sa.inspect(op.get_bind()).has_table(table)
+
+def has_column(table, column):
+    return any(c['name'] == column for c in sa.inspect(op.get_bind()).get_columns(table))
+
+def has_index(table, index):
+    return any(i['name'] == index for i in sa.inspect(op.get_bind()).get_indexes(table))
+
+def _is_valid_index(name):
+    """
+    Whether a PostgreSQL index is usable; a CREATE INDEX CONCURRENTLY that failed
+    or was interrupted leaves an invalid index behind that queries ignore
+    """
+    return op.get_bind().execute(
+        sa.text('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'),
+        {'name': name}
+    ).scalar()
+
+def create_table(name, *columns, **kwargs):
+    """Create a table unless db.create_all already made it"""
+    if has_table(name):
+        logger.info('Table %s already exists, skipping', name)
+        return
+    op.create_table(name, *columns, **kwargs)
+
+def add_column(table, column):
+    """
+    Add a nullable column unless it already exists (db.create_all may have made it)
+    On PostgreSQL this is a catalog-only change; the lock timeout keeps it from
+    waiting behind, and so blocking, other traffic
+    """
+    if has_column(table, column.name):
+        logger.info('Column %s.%s already exists, skipping', table, column.name)
+        return
+    if _is_postgresql():
+        op.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+    op.add_column(table, column)
+
+def create_index(name, table, columns, unique=False):
+    """
+    Create an index unless it exists, building it concurrently on PostgreSQL
+    An invalid index left by an earlier failed concurrent build is dropped and rebuilt
+    """
+    if has_index(table, name):
+        if not (_is_postgresql() and _is_valid_index(name) is False):
+            logger.info('Index %s already exists, skipping', name)
+            return
+        logger.warning('Index %s is invalid (an earlier build failed), rebuilding it', name)
+        drop_index(name, table)
+
+    started = time.monotonic()
+    logger.info('Building index %s on %s', name, table)
+    if _is_postgresql():
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            op.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+            op.create_index(name, table, columns, unique=unique,
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index(name, table, columns, unique=unique)
+    logger.info('Built index %s in %.1fs', name, time.monotonic() - started)
+
+def drop_index(name, table):
+    """Drop an index if present, concurrently on PostgreSQL"""
+    if not has_index(table, name):
+        return
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        op.drop_index(name, table_name=table)
+
+def backfill(table, assignments, pending, chunk_size=None, pause=None):
+    """
+    Run `UPDATE table SET assignments WHERE pending` over consecutive id ranges
+
+    `pending` must be false for rows already backfilled (e.g. "col IS NULL"), which
+    makes every chunk idempotent: an interrupted backfill is resumed by running the
+    migration again. Each chunk commits on its own so row locks are held only briefly.
+    BACKFILL_CHUNK_SIZE and BACKFILL_PAUSE (seconds between chunks) throttle it.
+    """
+    chunk_size = chunk_size or int(os.environ.get('BACKFILL_CHUNK_SIZE', 5000))
+    pause = float(os.environ.get('BACKFILL_PAUSE', 0.05)) if pause is None else pause
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(sa.text(f'SELECT MIN(id), MAX(id) FROM {table}')).one()
+        if low is None:
+            logger.info('Backfill of %s: table is empty', table)
+            return 0
+
+        statement = sa.text(
+            f'UPDATE {table} SET {assignments} WHERE id >= :start AND id < :end AND ({pending})'
+        )
+        span = high - low + 1
+        started = time.monotonic()
+        updated = 0
+        last_report = 0.0
+
+        for start in range(low, high + 1, chunk_size):
+            end = start + chunk_size
+            # Autocommit mode: each chunk commits as soon as it runs
+            updated += bind.execute(statement, {'start': start, 'end': end}).rowcount
+
+            done = min(end, high + 1) - low
+            elapsed = time.monotonic() - started
+            if elapsed - last_report >= 5 or done >= span:
+                last_report = elapsed
+                remaining = elapsed / done * (span - done)
+                logger.info('Backfill of %s: %.1f%% of id range, %d rows updated, ~%ds remaining',
+                            table, 100.0 * done / span, updated, remaining)
+            if pause:
+                time.sleep(pause)
+
+    logger.info('Backfill of %s finished: %d rows in %.1fs', table, updated, time.monotonic() - started)
+    return updated
@@ -0,0 +1,159 @@
+"""
+Phrase- and negation-aware sentiment scorer for the Serene application
+Compiles a lexicon of words, multi-word phrases, negators and intensifiers into
+a token-level Aho-Corasick automaton, so each text is scanned exactly once no
+matter how many phrases the lexicon holds
+"""
+import hashlib
+import json
+import math
+import os
+import re
+from collections import deque, namedtuple
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'sentiment_lexicon.json')
+
+# Bump when the scoring rules change; the version also changes with the lexicon
+SCORER_ALGORITHM = 3
+
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*|[.!?;]")
+BOUNDARIES = frozenset('.!?;')
+
+# Kinds of lexicon pattern
+TERM, NEGATOR, INTENSIFIER = 'term', 'negator', 'intensifier'
+
+SentimentScore = namedtuple('SentimentScore', ['score', 'label'])
+
+def tokenize(text):
+    """Lowercase word tokens with apostrophes dropped ("don't" -> "dont"), keeping sentence breaks"""
+    text = text.lower().replace('’', "'")
+    return [token.replace("'", '') for token in TOKEN_RE.findall(text)]
+
+class Automaton:
+    """Aho-Corasick automaton over token sequences"""
+
+    def __init__(self, patterns):
+        # patterns maps a tuple of tokens to its payload
+        self.goto = [{}]
+        self.fail = [0]
+        # Longest pattern ending in each state, as (length, payload)
+        self.match = [None]
+
+        for tokens, payload in patterns.items():
+            state = 0
+            for token in tokens:
+                following = self.goto[state].get(token)
+                if following is None:
+                    following = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.match.append(None)
+                    self.goto[state][token] = following
+                state = following
+            self.match[state] = (len(tokens), payload)
+
+        # Breadth-first so every fail target is finished before it is used
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, following in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[following] = self.goto[fallback].get(token, 0)
+                if self.match[following] is None:
+                    self.match[following] = self.match[self.fail[following]]
+                queue.append(following)
+
+class SentimentScorer:
+    """Scores text against a compiled lexicon"""
+
+    def __init__(self, lexicon):
+        self.negation_factor = float(lexicon.get('negation_factor', -0.75))
+        self.negation_window = int(lexicon.get('negation_window', 3))
+        self.intensifier_window = int(lexicon.get('intensifier_window', 2))
+
+        patterns = {}
+        sources = [(phrase, (TERM, float(weight))) for phrase, weight in lexicon.get('terms', {}).items()]
+        sources += [(phrase, (NEGATOR, None)) for phrase in lexicon.get('negators', [])]
+        sources += [(phrase, (INTENSIFIER, float(weight)))
+                    for phrase, weight in lexicon.get('intensifiers', {}).items()]
+        for phrase, payload in sources:
+            tokens = tuple(tokenize(phrase))
+            if not tokens:
+                raise ValueError(f'Empty lexicon entry: {phrase!r}')
+            if tokens in patterns and patterns[tokens][0] != payload[0]:
+                raise ValueError(f'Lexicon entry {phrase!r} is both a {patterns[tokens][0]} and a {payload[0]}')
+            patterns[tokens] = payload
+
+        self.automaton = Automaton(patterns)
+        canonical = json.dumps(lexicon, sort_keys=True).encode('utf-8')
+        self.version = hashlib.sha1(str(SCORER_ALGORITHM).encode('utf-8') + canonical).hexdigest()[:12]
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_LEXICON_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def score(self, text):
+        """Return a SentimentScore with a score in [-1, 1] and a Positive/Neutral/Negative label"""
+        automaton = self.automaton
+        goto, fail, match = automaton.goto, automaton.fail, automaton.match
+        total = 0.0
+        state = 0
+        negator_end = None
+        intensifier_end = None
+        multiplier = 1.0
+        # (end index, contribution) of the last term, so an overlapping longer phrase can replace it
+        last_term = None
+
+        for index, token in enumerate(tokenize(text)):
+            if token in BOUNDARIES:
+                # Modifiers never reach across sentences
+                state = 0
+                negator_end = intensifier_end = last_term = None
+                continue
+
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            found = match[state]
+            if found is None:
+                continue
+
+            length, (kind, value) = found
+            start = index - length + 1
+
+            if kind == NEGATOR:
+                negator_end = index
+            elif kind == INTENSIFIER:
+                # Stacked intensifiers ("so very") compound
+                if intensifier_end is not None and start - intensifier_end <= self.intensifier_window:
+                    multiplier *= value
+                else:
+                    multiplier = value
+                intensifier_end = index
+            else:
+                if last_term is not None and start <= last_term[0]:
+                    total -= last_term[1]
+
+                weight = value
+                # Modifiers inside the matched phrase belong to it ("not bad")
+                if intensifier_end is not None and intensifier_end < start \
+                        and start - intensifier_end <= self.intensifier_window:
+                    weight *= multiplier
+                if negator_end is not None and negator_end < start \
+                        and start - negator_end <= self.negation_window:
+                    weight *= self.negation_factor
+
+                # A modifier applies to the first term after it only ("not happy and sad")
+                negator_end = intensifier_end = None
+                total += weight
+                last_term = (index, weight)
+
+        if abs(total) < 1e-9:
+            return SentimentScore(0.0, 'Neutral')
+
+        # Squash the unbounded sum into [-1, 1]
+        normalized = round(total / math.sqrt(total * total + 15), 4)
+        return SentimentScore(normalized, 'Positive' if total > 0 else 'Negative')
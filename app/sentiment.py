@@ -0,0 +1,147 @@
+"""
+Sentiment result cache for the Serene application
+Memoizes score_sentiment by a hash of the text and the lexicon version, so
+unchanged re-saves and repeated live previews do not score the same text again
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from app.scorer import SentimentScore
+from app.utils import score_sentiment, sentiment_version
+
+logger = logging.getLogger(__name__)
+
+def text_key(text, version=None):
+    """Compact cache key for a text scored with a given lexicon version (the current one by default)"""
+    version = version or sentiment_version()
+    digest = hashlib.blake2b(version.encode('utf-8'), digest_size=16)
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8'))
+    return digest.digest()
+
+class DiskStore:
+    """SQLite-backed persistent store shared by every worker on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def _connection(self):
+        # One connection per thread and per process (connections must not cross a fork)
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS sentiment_scores '
+                '(key BLOB PRIMARY KEY, score REAL NOT NULL, sentiment TEXT NOT NULL)'
+            )
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        """The stored result for `key`, or None; a store that cannot be read counts as a miss"""
+        try:
+            row = self._connection().execute(
+                'SELECT score, sentiment FROM sentiment_scores WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed('read', e)
+            return None
+        return SentimentScore(*row) if row else None
+
+    def set(self, key, result):
+        """Store a result; failures (locked, full or corrupt database) are logged and skipped"""
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO sentiment_scores (key, score, sentiment) VALUES (?, ?, ?)',
+                    (key, result.score, result.label)
+                )
+        except sqlite3.Error as e:
+            self._failed('write', e)
+
+    def _failed(self, action, error):
+        logger.warning('Sentiment cache %s failed (%s): %s', action, self.path, error)
+        # Reconnect next time in case the connection itself is broken
+        connection = getattr(self.local, 'connection', None)
+        self.local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+
+class SentimentCache:
+    """Bounded LRU cache of sentiment scores with optional on-disk persistence"""
+
+    def __init__(self, app=None, max_size=10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SENTIMENT_CACHE_SIZE', self.max_size)
+        app.config.setdefault('SENTIMENT_CACHE_PATH', None)
+
+        self.max_size = int(app.config['SENTIMENT_CACHE_SIZE'])
+        self.entries = OrderedDict()
+        path = app.config['SENTIMENT_CACHE_PATH']
+        self.store = DiskStore(path) if path else None
+
+    def _get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+            return result
+
+    def _set(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def lookup(self, text):
+        """Return the cached (score, label) pair for `text`, or None without scoring it"""
+        key = text_key(text)
+        result = self._get(key)
+        if result is None and self.store is not None:
+            result = self.store.get(key)
+            if result is not None:
+                self._set(key, result)
+        if result is not None:
+            self.hits += 1
+        return result
+
+    def add(self, text, result):
+        """Cache a result scored elsewhere (e.g. in another process)"""
+        key = text_key(text)
+        if self.store is not None:
+            self.store.set(key, result)
+        self._set(key, result)
+
+    def score(self, text):
+        """Return the (score, label) pair for `text`, scoring it only on a cache miss"""
+        result = self.lookup(text)
+        if result is None:
+            self.misses += 1
+            result = score_sentiment(text)
+            self.add(text, result)
+        return result
+
+    def analyze(self, text):
+        """Return the sentiment label for `text`, scoring it only on a cache miss"""
+        return self.score(text).label
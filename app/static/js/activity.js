@@ -0,0 +1,85 @@
+// Records wellness activity sessions and sends them to the server in batches
+
+const SereneActivity = (function() {
+    const script = document.currentScript;
+    const csrfToken = script ? script.dataset.csrfToken : '';
+    const FLUSH_INTERVAL = 10000;
+    const MAX_BATCH = 100;
+    
+    let pending = [];
+    const openSessions = new Set();
+    
+    function record(activity, kind, durationMs) {
+        pending.push({
+            activity: activity,
+            kind: kind,
+            duration_ms: durationMs === undefined ? null : Math.round(durationMs),
+            occurred_at: new Date().toISOString()
+        });
+        if (pending.length >= MAX_BATCH) {
+            flush();
+        }
+    }
+    
+    function flush() {
+        if (pending.length === 0) {
+            return;
+        }
+        const events = pending.splice(0, MAX_BATCH);
+        // keepalive lets the request finish while the page is being unloaded
+        fetch('/api/activity-events', {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken
+            },
+            body: JSON.stringify({ events })
+        }).then(function(response) {
+            if (response.status === 503) {
+                // Server is busy: keep the events for the next attempt
+                pending = events.concat(pending);
+            }
+        }).catch(function() {
+            pending = events.concat(pending);
+        });
+    }
+    
+    // Start a session; call complete() or abandon() on the returned object when it ends
+    function start(activity) {
+        const startedAt = performance.now();
+        let finished = false;
+        const session = {
+            complete: function() { finish('completed'); },
+            abandon: function() { finish('abandoned'); }
+        };
+        function finish(kind) {
+            if (finished) {
+                return;
+            }
+            finished = true;
+            openSessions.delete(session);
+            record(activity, kind, performance.now() - startedAt);
+        }
+        openSessions.add(session);
+        record(activity, 'started');
+        return session;
+    }
+    
+    setInterval(flush, FLUSH_INTERVAL);
+    
+    window.addEventListener('pagehide', function() {
+        openSessions.forEach(function(session) {
+            session.abandon();
+        });
+        flush();
+    });
+    
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            flush();
+        }
+    });
+    
+    return { start, flush };
+})();
@@ -0,0 +1,174 @@
+"""
+Expiry sweeper for the Serene application
+Expires finished trials and lapsed subscriptions with set-based, chunked UPDATEs
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, delete, exists, func
+
+from app import db
+from app.models.user import User
+from app.models.subscription import Subscription
+from app.models.revoked_token import RevokedToken
+from app.models.entry_change import EntryChange
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def _lock_chunk(query, chunk_size):
+    """Select and lock the next chunk of ids, skipping rows held by live requests"""
+    query = query.limit(chunk_size).with_for_update(skip_locked=True)
+    return db.session.execute(query).all()
+
+def expire_trials(now=None, chunk_size=DEFAULT_CHUNK_SIZE, pause=0):
+    """Turn off `is_in_trial` for every user whose trial has ended"""
+    now = now or datetime.utcnow()
+    expired = (User.is_in_trial.is_(True)) & (User.trial_end_date < now)
+    total = 0
+
+    while True:
+        rows = _lock_chunk(select(User.id).where(expired).order_by(User.id), chunk_size)
+        if not rows:
+            break
+
+        # Re-check the predicate so rows changed since the select are left alone
+        result = db.session.execute(
+            update(User)
+            .where(User.id.in_([row.id for row in rows]), expired)
+            .values(is_in_trial=False)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += result.rowcount
+
+        if pause:
+            time.sleep(pause)
+
+    return total
+
+def expire_subscriptions(now=None, chunk_size=DEFAULT_CHUNK_SIZE, pause=0):
+    """
+    Mark active subscriptions past their period end as past_due and clear
+    `is_subscribed` for users left without any current subscription
+    Returns a tuple of (subscriptions lapsed, users unsubscribed)
+    """
+    now = now or datetime.utcnow()
+    lapsed = (Subscription.status == 'active') & (Subscription.current_period_end < now)
+    still_active = exists().where(
+        Subscription.user_id == User.id,
+        Subscription.status == 'active',
+        Subscription.current_period_end >= now
+    )
+    lapsed_total = 0
+    unsubscribed_total = 0
+
+    while True:
+        rows = _lock_chunk(
+            select(Subscription.id, Subscription.user_id).where(lapsed).order_by(Subscription.id),
+            chunk_size
+        )
+        if not rows:
+            break
+
+        result = db.session.execute(
+            update(Subscription)
+            .where(Subscription.id.in_([row.id for row in rows]), lapsed)
+            .values(status='past_due')
+            .execution_options(synchronize_session=False)
+        )
+        lapsed_total += result.rowcount
+
+        # Only the owners of this chunk can have lost their last subscription
+        user_ids = {row.user_id for row in rows}
+        result = db.session.execute(
+            update(User)
+            .where(User.id.in_(user_ids), User.is_subscribed.is_(True), ~still_active)
+            .values(is_subscribed=False)
+            .execution_options(synchronize_session=False)
+        )
+        unsubscribed_total += result.rowcount
+        db.session.commit()
+
+        if pause:
+            time.sleep(pause)
+
+    return lapsed_total, unsubscribed_total
+
+def purge_revoked_tokens(now=None, chunk_size=DEFAULT_CHUNK_SIZE, pause=0):
+    """Delete revocations of tokens that have expired on their own and no longer need them"""
+    now = now or datetime.utcnow()
+    total = 0
+
+    while True:
+        rows = _lock_chunk(
+            select(RevokedToken.jti).where(RevokedToken.expires_at < now).order_by(RevokedToken.expires_at),
+            chunk_size
+        )
+        if not rows:
+            break
+
+        result = db.session.execute(
+            delete(RevokedToken)
+            .where(RevokedToken.jti.in_([row.jti for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += result.rowcount
+
+        if pause:
+            time.sleep(pause)
+
+    return total
+
+def prune_entry_changes(now=None, chunk_size=DEFAULT_CHUNK_SIZE, pause=0):
+    """
+    Delete change rows delta sync no longer reads: upsert rows, whose ids live
+    on as Entry.change_seq, and delete tombstones older than SYNC_TOMBSTONE_DAYS,
+    which sync tokens that old can no longer ask for
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=current_app.config['SYNC_TOMBSTONE_DAYS'])
+    # The newest row stays so SQLite never hands out a sequence number twice
+    newest = db.session.execute(select(func.max(EntryChange.id))).scalar()
+    db.session.commit()
+    if newest is None:
+        return 0
+    prunable = (EntryChange.id < newest) & (
+        (EntryChange.op == 'upsert') | (EntryChange.created_at < cutoff)
+    )
+    total = 0
+
+    while True:
+        rows = _lock_chunk(select(EntryChange.id).where(prunable).order_by(EntryChange.id), chunk_size)
+        if not rows:
+            break
+
+        result = db.session.execute(
+            delete(EntryChange)
+            .where(EntryChange.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += result.rowcount
+
+        if pause:
+            time.sleep(pause)
+
+    return total
+
+def run_sweep(chunk_size=DEFAULT_CHUNK_SIZE, pause=0):
+    """Run every expiry pass against a single cut-off time and report the row counts"""
+    now = datetime.utcnow()
+    trials_expired = expire_trials(now, chunk_size, pause)
+    subscriptions_lapsed, users_unsubscribed = expire_subscriptions(now, chunk_size, pause)
+    tokens_purged = purge_revoked_tokens(now, chunk_size, pause)
+    changes_pruned = prune_entry_changes(now, chunk_size, pause)
+
+    return {
+        'trials_expired': trials_expired,
+        'subscriptions_lapsed': subscriptions_lapsed,
+        'users_unsubscribed': users_unsubscribed,
+        'tokens_purged': tokens_purged,
+        'changes_pruned': changes_pruned
+    }
@@ -0,0 +1,244 @@
+"""
+Stateless API tokens for the Serene application
+API clients send a short-lived signed access token in the Authorization header
+instead of a session cookie. The token carries the user's profile as claims,
+so authenticating a request neither opens a session nor loads the user from
+the database. Refresh tokens obtain new access tokens. Revoked token ids are
+mirrored in memory by every worker and checked without any I/O
+"""
+import hashlib
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import g, request, jsonify
+from flask.sessions import SecureCookieSession, SessionInterface
+from flask_login import UserMixin
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+ACCESS_SALT = 'api-access'
+REFRESH_SALT = 'api-refresh'
+
+DATETIME_CLAIMS = ('trial_end_date', 'created_at')
+
+# Revocations are re-read with this much overlap so a row committed late by
+# another worker is still picked up
+POLL_OVERLAP = timedelta(seconds=60)
+
+def bearer_token(req=None):
+    """The token in the request's `Authorization: Bearer` header, or None"""
+    header = (req or request).headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    return None
+
+class TokenUser(UserMixin):
+    """The user described by an access token's claims, built without a database query"""
+
+    def __init__(self, claims, admin_usernames=()):
+        self.claims = claims
+        self.jti = claims['jti']
+        for key, value in claims['user'].items():
+            if key in DATETIME_CLAIMS and value:
+                value = datetime.fromisoformat(value)
+            setattr(self, key, value)
+        self.is_admin = self.username in admin_usernames
+
+    def to_dict(self):
+        """Convert to dictionary for API responses"""
+        return dict(self.claims['user'])
+
+    def __repr__(self):
+        return f'<TokenUser {self.username}>'
+
+class StatelessSession(SecureCookieSession):
+    """Session of a bearer-authenticated request: starts empty and is never stored"""
+
+class BearerSessionInterface(SessionInterface):
+    """Skips loading and saving the server-side session for bearer-authenticated requests"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def open_session(self, app, request):
+        if bearer_token(request) is not None:
+            return StatelessSession()
+        return self.inner.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if isinstance(session, StatelessSession):
+            return
+        return self.inner.save_session(app, session, response)
+
+    def make_null_session(self, app):
+        return self.inner.make_null_session(app)
+
+    def is_null_session(self, obj):
+        return self.inner.is_null_session(obj)
+
+class RevocationList:
+    """In-memory map of revoked, not yet expired token ids to their expiry"""
+
+    def __init__(self):
+        self.expiry = {}
+        self.lock = threading.Lock()
+        self.pid = None
+        self.poller = None
+        self.last_poll = None
+
+    def __contains__(self, jti):
+        return jti in self.expiry
+
+    def add(self, jti, expires_at):
+        self.expiry[jti] = expires_at
+
+    def refresh(self):
+        """Copy revocations made since the last poll (all of them on the first call) into memory"""
+        from app import db
+        from app.models.revoked_token import RevokedToken
+
+        now = datetime.utcnow()
+        query = db.session.query(RevokedToken.jti, RevokedToken.expires_at) \
+                          .filter(RevokedToken.expires_at > now)
+        if self.last_poll is not None:
+            query = query.filter(RevokedToken.revoked_at >= self.last_poll - POLL_OVERLAP)
+        rows = query.all()
+        db.session.commit()
+
+        for jti, expires_at in rows:
+            self.expiry[jti] = expires_at
+        # Expired tokens fail their signature check anyway
+        for jti in [jti for jti, expires_at in list(self.expiry.items()) if expires_at <= now]:
+            self.expiry.pop(jti, None)
+        self.last_poll = now
+
+    def ensure_loaded(self, app, interval):
+        """Load the list once per process and start the background poller"""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # Threads and stale state do not survive a fork
+            self.expiry = {}
+            self.last_poll = None
+            with app.app_context():
+                self.refresh()
+            self.poller = threading.Thread(target=self._poll, args=(app, interval),
+                                           name='token-revocations', daemon=True)
+            self.poller.start()
+            self.pid = os.getpid()
+
+    def _poll(self, app, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    self.refresh()
+            except Exception:
+                logger.exception('Failed to refresh the token revocation list')
+
+class TokenAuth:
+    """Flask extension issuing, verifying and revoking API bearer tokens"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.revoked = RevocationList()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ACCESS_TOKEN_TTL', 900)
+        app.config.setdefault('REFRESH_TOKEN_TTL', 30 * 24 * 3600)
+        app.config.setdefault('TOKEN_REVOCATION_POLL', 10)
+        self.app = app
+
+        # Bearer requests carry no cookies for a forged cross-site request to
+        # ride on, so only cookie-authenticated requests need a CSRF token
+        app.config['WTF_CSRF_CHECK_DEFAULT'] = False
+        app.session_interface = BearerSessionInterface(app.session_interface)
+        app.before_request(self.authenticate_request)
+        app.login_manager.request_loader(self.load_user)
+
+    def _serializer(self, salt):
+        return URLSafeTimedSerializer(self.app.config['SECRET_KEY'], salt=salt,
+                                      signer_kwargs={'digest_method': hashlib.sha256})
+
+    def issue(self, user):
+        """Return a fresh access and refresh token pair for `user`"""
+        config = self.app.config
+        access = self._serializer(ACCESS_SALT).dumps({'jti': secrets.token_urlsafe(12), 'user': user.to_dict()})
+        refresh = self._serializer(REFRESH_SALT).dumps({'jti': secrets.token_urlsafe(12), 'sub': user.id})
+        return {
+            'access_token': access,
+            'token_type': 'Bearer',
+            'expires_in': config['ACCESS_TOKEN_TTL'],
+            'refresh_token': refresh,
+            'refresh_expires_in': config['REFRESH_TOKEN_TTL']
+        }
+
+    def _verify(self, token, salt, ttl):
+        try:
+            claims, issued = self._serializer(salt).loads(token, max_age=ttl, return_timestamp=True)
+        except (BadSignature, SignatureExpired):
+            return None
+        self.revoked.ensure_loaded(self.app, self.app.config['TOKEN_REVOCATION_POLL'])
+        if claims.get('jti') in self.revoked:
+            return None
+        claims['exp'] = issued.replace(tzinfo=None) + timedelta(seconds=ttl)
+        return claims
+
+    def verify_access(self, token):
+        """Claims of a valid, unrevoked access token, or None"""
+        return self._verify(token, ACCESS_SALT, self.app.config['ACCESS_TOKEN_TTL'])
+
+    def verify_refresh(self, token):
+        """Claims of a valid, unrevoked refresh token, or None"""
+        return self._verify(token, REFRESH_SALT, self.app.config['REFRESH_TOKEN_TTL'])
+
+    def revoke(self, claims):
+        """
+        Revoke the token with these claims until it expires
+        Returns False if it had already been revoked, e.g. by a concurrent refresh
+        """
+        from app import db
+        from app.models.revoked_token import RevokedToken
+
+        user_id = claims['user']['id'] if 'user' in claims else claims['sub']
+        db.session.add(RevokedToken(jti=claims['jti'], user_id=user_id, expires_at=claims['exp']))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        self.revoked.add(claims['jti'], claims['exp'])
+        return True
+
+    def authenticate_request(self):
+        """Authenticate bearer requests from their token; check CSRF on the rest"""
+        token = bearer_token()
+        if token is None:
+            csrf = self.app.extensions.get('csrf')
+            if csrf is not None and self.app.config['WTF_CSRF_ENABLED']:
+                csrf.protect(apply_exemptions=True)
+            return None
+
+        claims = self.verify_access(token)
+        if claims is None:
+            response = jsonify({'error': 'Invalid or expired token'})
+            response.status_code = 401
+            response.headers['WWW-Authenticate'] = 'Bearer error="invalid_token"'
+            return response
+        g.token_user = TokenUser(claims, self.app.config.get('ADMIN_USERNAMES', ()))
+        return None
+
+    def load_user(self, request):
+        """Flask-Login request loader: the user authenticated by the bearer token, if any"""
+        return g.get('token_user')
@@ -1,10 +1,10 @@
 """
 Utility functions for the Serene application
 """
-import re
+import os
 from datetime import datetime, timedelta
-import json
-from flask import current_app
+
+from app.scorer import SentimentScorer, DEFAULT_LEXICON_PATH
 
 def format_date(date_string, format_string='%Y-%m-%d'):
     """Convert a date string to a formatted date"""
@@ -28,36 +28,42 @@ def get_date_range(days=30):
     start_date = end_date - timedelta(days=days)
     return start_date, end_date
 
-def analyze_sentiment(text):
+_scorer = None
+
+def get_scorer():
     """
-    A simple sentiment analysis function
-    In a real app, this would use a proper NLP library or API
+    The scorer compiled from the sentiment lexicon (SENTIMENT_LEXICON_PATH
+    overrides the bundled one); built on first use so the path can come from .env
     """
-    # Simple word-based sentiment analysis
-    positive_words = ['happy', 'joy', 'love', 'excited', 'grateful', 'thankful', 'good', 'great', 
-                      'excellent', 'amazing', 'wonderful', 'beautiful', 'accomplished', 'peaceful',
-                      'calm', 'relaxed', 'content', 'pleased', 'delighted', 'cheerful', 'hopeful']
-    
-    negative_words = ['sad', 'angry', 'upset', 'depressed', 'anxious', 'worried', 'hate', 'dislike', 
-                      'bad', 'terrible', 'awful', 'miserable', 'stressed', 'frustrated', 'annoyed',
-                      'disappointed', 'unhappy', 'hurt', 'lonely', 'grief', 'pain', 'fear', 'scared']
-    
-    # Convert to lowercase and remove punctuation
-    text = text.lower()
-    text = re.sub(r'[^\w\s]', '', text)
-    words = text.split()
-    
-    # Count sentiment words
-    positive_count = sum(1 for word in words if word in positive_words)
-    negative_count = sum(1 for word in words if word in negative_words)
-    
-    # Determine sentiment
-    if positive_count > negative_count:
-        return 'Positive'
-    elif negative_count > positive_count:
-        return 'Negative'
-    else:
-        return 'Neutral'
+    global _scorer
+    if _scorer is None:
+        _scorer = SentimentScorer.from_file(os.environ.get('SENTIMENT_LEXICON_PATH', DEFAULT_LEXICON_PATH))
+    return _scorer
+
+def sentiment_version():
+    """Identifies the lexicon and scoring rules that produced a stored sentiment"""
+    return get_scorer().version
+
+# Version of sentiments the server scored before versions were recorded;
+# a NULL version means the client supplied the sentiment
+LEGACY_SENTIMENT_VERSION = '0'
+
+def is_stale_sentiment(version):
+    """Whether a stored sentiment was scored by the server with an older lexicon"""
+    return version is not None and version != sentiment_version()
+
+def score_sentiment(text):
+    """
+    Score the sentiment of a text
+    Returns a (score, label) pair with the score in [-1, 1] and the label one of
+    "Positive", "Neutral" or "Negative"; phrases, negation and intensifiers are
+    taken into account
+    """
+    return get_scorer().score(text)
+
+def analyze_sentiment(text):
+    """Return the sentiment label ("Positive", "Neutral" or "Negative") for a text"""
+    return get_scorer().score(text).label
 
 def get_mood_emoji(mood):
     """Return emoji for a given mood"""
@@ -0,0 +1,57 @@
+"""
+Warm-up helpers for the Serene application
+Fill the template, lexicon and connection caches before a worker accepts traffic
+"""
+from jinja2 import TemplateError
+
+from app import db
+from app.utils import analyze_sentiment
+
+# Public pages that can be rendered without a logged-in user
+WARMUP_PATHS = ('/login', '/register')
+
+def warm_templates(app):
+    """Compile every template once so requests only hit Jinja's cache"""
+    compiled = 0
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+            compiled += 1
+        except TemplateError:
+            app.logger.warning('Could not compile template %s during warm-up', name)
+    return compiled
+
+def warm_lexicon():
+    """Run the sentiment analyzer once so its word lists are built"""
+    analyze_sentiment('warm up')
+
+def warm_requests(app, paths=WARMUP_PATHS):
+    """Send a few internal requests through the full routing and rendering stack"""
+    client = app.test_client()
+    for path in paths:
+        response = client.get(path)
+        if response.status_code >= 500:
+            app.logger.warning('Warm-up request to %s returned %s', path, response.status_code)
+
+def warm_connections(app, count):
+    """Open `count` pooled database connections so the first requests do not pay for connecting"""
+    with app.app_context():
+        connections = [db.engine.connect() for _ in range(count)]
+        for connection in connections:
+            connection.exec_driver_sql('SELECT 1')
+        # Closing returns the connections to the pool, they stay open
+        for connection in connections:
+            connection.close()
+
+def reset_connections(app):
+    """Drop pooled connections inherited from a parent process without closing them under it"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def warm_up(app):
+    """Process-wide warm-up, safe to run before forking workers"""
+    compiled = warm_templates(app)
+    warm_lexicon()
+    warm_requests(app)
+    app.logger.info('Warm-up complete: %d templates compiled', compiled)
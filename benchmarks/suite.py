@@ -0,0 +1,266 @@
+"""
+Microbenchmarks for the Serene application
+Times the hot helpers, model serializers and page templates on representative
+inputs, and compares runs against a stored baseline. A case counts as a
+regression only when its median time per call is slower by more than the
+allowed ratio and a Mann-Whitney U test says the two sets of samples really
+differ, so ordinary timing noise does not fail a run
+"""
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+BASELINE_FORMAT = 1
+
+MOODS = ('Happy', 'Neutral', 'Sad', 'Angry', 'Tired')
+
+WORDS = ['today', 'i', 'went', 'to', 'the', 'park', 'with', 'my', 'friend', 'and', 'we', 'talked',
+         'about', 'work', 'family', 'weekend', 'plans', 'it', 'was', 'a', 'day', 'happy', 'calm',
+         'grateful', 'tired', 'stressed', 'anxious', 'not', 'very', 'really', 'good', 'bad', 'sad',
+         'excited', 'overwhelmed', 'peaceful', 'lonely', 'proud', 'worried', 'relaxed']
+
+def journal_text(rng, length):
+    """A journal entry of about `length` characters mixing filler and sentiment words"""
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        if rng.random() < 0.08:
+            word += '.'
+        parts.append(word)
+        size += len(word) + 1
+    return ' '.join(parts)[:length]
+
+def create_benchmark_app():
+    """The application configured for benchmarking, on an empty in-memory database"""
+    # Never touch a real database, and keep runs independent of local settings
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    os.environ.pop('PROFILER_ENABLED', None)
+
+    from app import create_app
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    # base.html and dashboard.html still link to endpoints that were renamed
+    # (journal.journal, games.games, main.subscription); render those links as
+    # placeholders so the pages can be timed
+    app.url_build_error_handlers.append(lambda error, endpoint, values: '#')
+    return app
+
+class Case:
+    """One benchmark: a named callable timed as a whole"""
+
+    def __init__(self, name, func, description):
+        self.name = name
+        self.func = func
+        self.description = description
+
+def build_cases(app):
+    """Every benchmark case, bound to representative inputs"""
+    from flask_login import login_user
+
+    from app.forms.journal import JournalEntryForm
+    from app.models.entry import Entry
+    from app.models.user import User
+    from app.utils import analyze_sentiment, get_mood_color, get_mood_emoji
+
+    rng = random.Random(42)
+    now = datetime(2024, 6, 15, 12, 0, 0)
+
+    short_texts = [journal_text(rng, 200) for _ in range(50)]
+    long_texts = [journal_text(rng, 5000) for _ in range(10)]
+
+    user = User(id=1, username='benchmark', email='benchmark@example.com', name='Benchmark User',
+                is_subscribed=False, is_in_trial=True, trial_end_date=now + timedelta(days=12),
+                created_at=now - timedelta(days=18))
+    user.password = 'correct horse battery staple'
+
+    entries = [
+        Entry(id=i, user_id=1, date=now - timedelta(hours=7 * i), mood=MOODS[i % len(MOODS)],
+              journal_entry=journal_text(rng, 600), sentiment=('Positive', 'Neutral', 'Negative')[i % 3],
+              sentiment_version='v1', created_at=now - timedelta(hours=7 * i),
+              updated_at=now - timedelta(hours=7 * i), change_seq=i)
+        for i in range(1, 101)
+    ]
+
+    formatdate = app.jinja_env.filters['formatdate']
+    dates = [now - timedelta(days=i) for i in range(100)]
+    date_strings = [date.strftime('%Y-%m-%d') for date in dates]
+    moods = [MOODS[i % len(MOODS)] for i in range(100)] + ['Unknown']
+
+    calendar_data = {}
+    for entry in entries:
+        day = calendar_data.setdefault(entry.date.strftime('%Y-%m-%d'), {'count': 0, 'moods': []})
+        day['count'] += 1
+        day['moods'].append(entry.mood)
+
+    def render(template, **context):
+        from flask import render_template
+        with app.test_request_context('/'):
+            login_user(user)
+            if template == 'journal.html':
+                context['form'] = JournalEntryForm()
+            return render_template(template, **context)
+
+    return [
+        Case('analyze_sentiment.short', lambda: [analyze_sentiment(text) for text in short_texts],
+             '50 entries of 200 characters'),
+        Case('analyze_sentiment.long', lambda: [analyze_sentiment(text) for text in long_texts],
+             '10 entries of 5000 characters'),
+        Case('formatdate.datetime', lambda: [formatdate(date) for date in dates],
+             '100 datetimes'),
+        Case('formatdate.string', lambda: [formatdate(value, '%b %d') for value in date_strings],
+             '100 date strings'),
+        Case('entry.to_dict', lambda: [entry.to_dict() for entry in entries],
+             '100 entries'),
+        Case('user.verify_password', lambda: user.verify_password('correct horse battery staple'),
+             'one password check'),
+        Case('mood.get_mood_color', lambda: [get_mood_color(mood) for mood in moods],
+             '101 moods'),
+        Case('mood.get_mood_emoji', lambda: [get_mood_emoji(mood) for mood in moods],
+             '101 moods'),
+        Case('render.dashboard', lambda: render(
+            'dashboard.html', title='Dashboard', recent_entries=entries[:5],
+            mood_data={mood: 20 for mood in MOODS}, is_subscribed=False, is_in_trial=True,
+            trial_days_left=12
+        ), 'dashboard with 5 recent entries'),
+        Case('render.journal', lambda: render(
+            'journal.html', title='Journal', entries=entries[:10], selected_date=now,
+            calendar_data=json.dumps(calendar_data)
+        ), 'journal page with 10 entries'),
+    ]
+
+def _calibrate(func, min_time):
+    """Number of calls per sample so that one sample takes at least `min_time` seconds"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return loops
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.2))
+
+def _sample(func, loops):
+    started = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - started) / loops
+
+def environment():
+    """Where the numbers came from; comparisons across different machines are unreliable"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count()
+    }
+
+def run(cases, samples=20, min_time=0.05, only=None, progress=None):
+    """Measure `cases` (those whose names start with one of `only`), returning a results document"""
+    cases = [case for case in cases if not only or any(case.name.startswith(prefix) for prefix in only)]
+    loops = {}
+    for case in cases:
+        case.func()
+        loops[case.name] = _calibrate(case.func, min_time)
+
+    # Samples are taken round-robin so that a slow spell of the machine is
+    # spread over every case rather than landing on whichever ran during it
+    values = {case.name: [] for case in cases}
+    for _ in range(samples):
+        for case in cases:
+            values[case.name].append(_sample(case.func, loops[case.name]))
+
+    results = {}
+    for case in cases:
+        times = values[case.name]
+        results[case.name] = {
+            'description': case.description,
+            'loops': loops[case.name],
+            'median': statistics.median(times),
+            'mean': statistics.fmean(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'min': min(times),
+            'samples': times
+        }
+        if progress:
+            progress(case.name, results[case.name])
+    return {
+        'format': BASELINE_FORMAT,
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': environment(),
+        'results': results
+    }
+
+def mann_whitney_u(a, b):
+    """
+    Two-sided Mann-Whitney U test of whether samples `a` and `b` come from the
+    same distribution, using the normal approximation with a tie correction
+    Returns the p-value
+    """
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+
+    # Average ranks over runs of equal values
+    ranks = [0.0] * len(combined)
+    ties = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        count = j - i + 1
+        ties += count ** 3 - count
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+def compare(baseline, current, threshold=0.10, alpha=0.01):
+    """
+    Compare the cases present in both runs
+    Returns a list of (name, baseline median, current median, ratio, p-value,
+    verdict) with verdict one of 'regression', 'improvement' or 'unchanged'
+    """
+    rows = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        p_value = mann_whitney_u(before['samples'], result['samples'])
+        if p_value < alpha and ratio > 1 + threshold:
+            verdict = 'regression'
+        elif p_value < alpha and ratio < 1 / (1 + threshold):
+            verdict = 'improvement'
+        else:
+            verdict = 'unchanged'
+        rows.append((name, before['median'], result['median'], ratio, p_value, verdict))
+    return rows
+
+def format_time(seconds):
+    """Seconds as a short human-readable duration"""
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
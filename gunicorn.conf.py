@@ -0,0 +1,79 @@
+"""
+Gunicorn configuration for running Serene in production
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The application is preloaded in the master so workers share its memory pages
+through copy-on-write, then each worker opens its own database connections
+before it starts accepting requests. Every setting can be overridden from the
+environment. For the async API mode serve the ASGI app with uvicorn workers:
+
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+"""
+import gc
+import os
+
+def _available_cores():
+    """Number of CPUs this process may run on (respects container CPU sets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _flask_app(app):
+    """The Flask app, whether it is served directly or wrapped by the ASGI app"""
+    state = getattr(app, 'state', None)
+    return getattr(state, 'flask_app', app)
+
+cores = _available_cores()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Requests mix CPU work (password hashing, sentiment) with database I/O: one
+# process per core (plus one) keeps the CPUs busy, and a few threads per
+# process overlap the I/O waits
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', cores + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+preload_app = True
+
+# Recycle workers gracefully; the jitter stops them all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+graceful_timeout = 30
+timeout = 30
+keepalive = 5
+
+# Heartbeat files on tmpfs avoid stalls on slow container disks
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def when_ready(server):
+    """Warm shared caches in the master, then freeze them out of the GC's reach"""
+    from app.warmup import warm_up
+
+    warm_up(_flask_app(server.app.wsgi()))
+    # Keep the garbage collector from touching (and so copying) preloaded objects
+    gc.freeze()
+
+def post_fork(server, worker):
+    """Discard database connections inherited from the master"""
+    from app.warmup import reset_connections
+
+    reset_connections(_flask_app(server.app.wsgi()))
+
+def post_worker_init(worker):
+    """Fill this worker's connection pool before it accepts traffic"""
+    from app.warmup import warm_connections
+
+    warm_connections(_flask_app(worker.wsgi), threads)
+
+def worker_exit(server, worker):
+    """Write buffered activity events before the worker goes away"""
+    from app import activity_buffer
+
+    activity_buffer.close()
@@ -0,0 +1,68 @@
+"""Baseline schema
+
+Revision ID: 1c2f5b7a9d01
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import create_table
+
+
+# revision identifiers, used by Alembic.
+revision = '1c2f5b7a9d01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=64), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=True),
+        sa.Column('is_subscribed', sa.Boolean(), nullable=True),
+        sa.Column('is_in_trial', sa.Boolean(), nullable=True),
+        sa.Column('trial_end_date', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+    )
+    create_table(
+        'entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=False),
+        sa.Column('mood', sa.String(length=20), nullable=False),
+        sa.Column('journal_entry', sa.Text(), nullable=False),
+        sa.Column('sentiment', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    create_table(
+        'subscriptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('current_period_start', sa.DateTime(), nullable=False),
+        sa.Column('current_period_end', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('stripe_customer_id', sa.String(length=120), nullable=True),
+        sa.Column('stripe_subscription_id', sa.String(length=120), nullable=True),
+        sa.Column('plan', sa.String(length=20), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('subscriptions')
+    op.drop_table('entries')
+    op.drop_table('users')
@@ -0,0 +1,25 @@
+"""Add indexes for the trial and subscription expiry sweeper
+
+Revision ID: 3e8a0d4c6b12
+Revises: 1c2f5b7a9d01
+Create Date: 2026-10-19 09:10:00.000000
+
+"""
+from app.schema import create_index, drop_index
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8a0d4c6b12'
+down_revision = '1c2f5b7a9d01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index('ix_users_trial_expiry', 'users', ['is_in_trial', 'trial_end_date'])
+    create_index('ix_subscriptions_status_period_end', 'subscriptions', ['status', 'current_period_end'])
+
+
+def downgrade():
+    drop_index('ix_subscriptions_status_period_end', 'subscriptions')
+    drop_index('ix_users_trial_expiry', 'users')
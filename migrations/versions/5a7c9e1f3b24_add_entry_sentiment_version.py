@@ -0,0 +1,30 @@
+"""Record which sentiment lexicon version scored each entry
+
+Revision ID: 5a7c9e1f3b24
+Revises: 3e8a0d4c6b12
+Create Date: 2026-10-19 09:20:00.000000
+
+Existing entries keep a NULL version; scripts/rescore_sentiment.py scores them
+with the current lexicon.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import add_column
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7c9e1f3b24'
+down_revision = '3e8a0d4c6b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_column('entries', sa.Column('sentiment_version', sa.String(length=16), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('entries') as batch_op:
+        batch_op.drop_column('sentiment_version')
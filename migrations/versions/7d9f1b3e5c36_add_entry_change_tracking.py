@@ -0,0 +1,47 @@
+"""Add change tracking to entries for delta sync
+
+Revision ID: 7d9f1b3e5c36
+Revises: 5a7c9e1f3b24
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import create_table, add_column, create_index, drop_index, backfill
+
+
+# revision identifiers, used by Alembic.
+revision = '7d9f1b3e5c36'
+down_revision = '5a7c9e1f3b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_table(
+        'entry_changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entry_id', sa.Integer(), nullable=True),
+        sa.Column('op', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    create_index('ix_entry_changes_user_op_id', 'entry_changes', ['user_id', 'op', 'id'])
+
+    add_column('entries', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    add_column('entries', sa.Column('change_seq', sa.Integer(), nullable=True))
+    create_index('ix_entries_user_change_seq', 'entries', ['user_id', 'change_seq'])
+
+    # Entries never edited before tracking started were last updated when created
+    backfill('entries', 'updated_at = created_at', 'updated_at IS NULL')
+
+
+def downgrade():
+    drop_index('ix_entries_user_change_seq', 'entries')
+    with op.batch_alter_table('entries') as batch_op:
+        batch_op.drop_column('change_seq')
+        batch_op.drop_column('updated_at')
+    op.drop_table('entry_changes')
@@ -0,0 +1,44 @@
+"""Add compressed per-user-month entry archives
+
+Revision ID: 9b1d3f5a7e48
+Revises: 7d9f1b3e5c36
+Create Date: 2026-10-19 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import create_table, create_index, drop_index
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1d3f5a7e48'
+down_revision = '7d9f1b3e5c36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_table(
+        'entry_archives',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('entry_count', sa.Integer(), nullable=False),
+        sa.Column('min_entry_id', sa.Integer(), nullable=False),
+        sa.Column('max_entry_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'year', 'month', name='uq_entry_archives_user_month')
+    )
+    create_index('ix_entry_archives_user_max_entry', 'entry_archives', ['user_id', 'max_entry_id'])
+    create_index('ix_entries_user_date', 'entries', ['user_id', 'date'])
+
+
+def downgrade():
+    drop_index('ix_entries_user_date', 'entries')
+    op.drop_table('entry_archives')
@@ -0,0 +1,29 @@
+"""Mark sentiments the server scored before versions were recorded
+
+Revision ID: a9c1e3f5b70d
+Revises: f7b9d1e3a58c
+Create Date: 2026-10-19 12:40:00.000000
+
+Entries untouched since before change tracking (change_seq IS NULL) predate
+sentiment versions and get the legacy version '0', so the rescoring job picks
+them up. A NULL version is left for sentiments supplied by the client, which
+are never rescored.
+
+"""
+from app.schema import backfill
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c1e3f5b70d'
+down_revision = 'f7b9d1e3a58c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    backfill('entries', "sentiment_version = '0'",
+             'sentiment_version IS NULL AND change_seq IS NULL AND sentiment IS NOT NULL')
+
+
+def downgrade():
+    backfill('entries', 'sentiment_version = NULL', "sentiment_version = '0'")
@@ -0,0 +1,38 @@
+"""Add month-partitioned activity events table
+
+Revision ID: b3d5f7a9c15a
+Revises: 9b1d3f5a7e48
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import create_table
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d5f7a9c15a'
+down_revision = '9b1d3f5a7e48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A new, empty table: partitions for each month are created on demand by
+    # the ingestion buffer (app/ingest.py)
+    create_table(
+        'activity_events',
+        sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('activity', sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column('kind', sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column('duration_ms', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'occurred_at', 'activity', 'kind'),
+        postgresql_partition_by='RANGE (occurred_at)'
+    )
+
+
+def downgrade():
+    # Dropping the parent drops every partition with it
+    op.drop_table('activity_events')
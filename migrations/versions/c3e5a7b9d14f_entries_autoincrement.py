@@ -0,0 +1,49 @@
+"""Never reuse journal entry ids on SQLite
+
+Revision ID: c3e5a7b9d14f
+Revises: a9c1e3f5b70d
+Create Date: 2026-10-19 13:20:00.000000
+
+Archiving deletes entries from the hot table but keeps their ids, which
+SQLite would otherwise hand out again to new entries. The table is rebuilt
+with AUTOINCREMENT and its sequence moved past every archived id. PostgreSQL
+sequences never reuse ids, so nothing changes there.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d14f'
+down_revision = 'a9c1e3f5b70d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+
+    definition = bind.execute(
+        sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'entries'")
+    ).scalar()
+    if 'AUTOINCREMENT' not in definition.upper():
+        with op.batch_alter_table('entries', recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+    high = max(
+        bind.execute(sa.text('SELECT MAX(id) FROM entries')).scalar() or 0,
+        bind.execute(sa.text('SELECT MAX(max_entry_id) FROM entry_archives')).scalar() or 0
+    )
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'entries'")
+    op.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('entries', :seq)").bindparams(seq=high))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('entries', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
@@ -0,0 +1,35 @@
+"""Add revoked API tokens table
+
+Revision ID: d5f7a9c1e36b
+Revises: b3d5f7a9c15a
+Create Date: 2026-10-19 10:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import create_table, create_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f7a9c1e36b'
+down_revision = 'b3d5f7a9c15a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_table(
+        'revoked_tokens',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('jti')
+    )
+    create_index('ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'])
+    create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade():
+    op.drop_table('revoked_tokens')
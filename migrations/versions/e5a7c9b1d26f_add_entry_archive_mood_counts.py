@@ -0,0 +1,55 @@
+"""Store per-mood entry counts on each entry archive block
+
+Revision ID: e5a7c9b1d26f
+Revises: c3e5a7b9d14f
+Create Date: 2026-10-19 13:40:00.000000
+
+The dashboard sums these instead of decompressing every block a user has.
+Existing blocks are counted once here, reading a chunk of blocks at a time.
+
+"""
+from collections import Counter
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import add_column
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9b1d26f'
+down_revision = 'c3e5a7b9d14f'
+branch_labels = None
+depends_on = None
+
+CHUNK_SIZE = 500
+
+
+def upgrade():
+    add_column('entry_archives', sa.Column('mood_counts', sa.JSON(), nullable=True))
+
+    bind = op.get_bind()
+    blocks = sa.table('entry_archives', sa.column('id', sa.Integer), sa.column('data', sa.LargeBinary),
+                      sa.column('mood_counts', sa.JSON))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(blocks.c.id, blocks.c.data)
+            .where(blocks.c.id > last_id, blocks.c.mood_counts.is_(None))
+            .order_by(blocks.c.id)
+            .limit(CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            entries = json.loads(zlib.decompress(row.data).decode('utf-8'))
+            counts = dict(Counter(entry['mood'] for entry in entries))
+            bind.execute(blocks.update().where(blocks.c.id == row.id).values(mood_counts=counts))
+        last_id = rows[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('entry_archives') as batch_op:
+        batch_op.drop_column('mood_counts')
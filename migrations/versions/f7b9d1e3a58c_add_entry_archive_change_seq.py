@@ -0,0 +1,30 @@
+"""Record the latest change sequence held by each entry archive block
+
+Revision ID: f7b9d1e3a58c
+Revises: d5f7a9c1e36b
+Create Date: 2026-10-19 12:10:00.000000
+
+Existing blocks keep a NULL value; delta sync reads them until they are next
+rewritten, after which only blocks with newer changes are opened.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.schema import add_column
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b9d1e3a58c'
+down_revision = 'd5f7a9c1e36b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_column('entry_archives', sa.Column('max_change_seq', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('entry_archives') as batch_op:
+        batch_op.drop_column('max_change_seq')
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Script to archive old journal entries into compressed per-user-month blocks
+Intended to run as a periodic background job; entries that are already
+archived are merged into their month's block, which is recompressed
+"""
+import os
+import sys
+import argparse
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.archive import archive_entries, archive_cutoff
+
+def main():
+    """Main function to archive entries"""
+    parser = argparse.ArgumentParser(description='Archive old journal entries')
+    parser.add_argument('--older-than-days', type=int, default=None,
+                        help='Archive entries older than this (defaults to ARCHIVE_AFTER_DAYS)')
+    parser.add_argument('--pause', type=float, default=0,
+                        help='Seconds to sleep between user-months')
+    args = parser.parse_args()
+
+    def progress(user_id, year, month, count):
+        print(f"Archived {count} entries for user {user_id} in {year}-{month:02d}")
+
+    app = create_app()
+    with app.app_context():
+        cutoff = archive_cutoff(args.older_than_days)
+        print(f"Archiving entries dated before {cutoff:%Y-%m-%d}...")
+        moved = archive_entries(args.older_than_days, pause=args.pause, progress=progress)
+
+    print(f"Archival complete! {moved} entries archived.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Script to load-test the JSON API at high concurrency
+Run it against the same database served both ways, e.g.
+
+    gunicorn -c gunicorn.conf.py -b :5000 wsgi:app
+    gunicorn -c gunicorn.conf.py -b :5001 -k uvicorn.workers.UvicornWorker asgi:app
+    python scripts/benchmark_async.py --url http://localhost:5000 --url http://localhost:5001
+
+Each URL gets the same number of requests from the same number of concurrent
+connections; throughput, latency percentiles and failures are reported side by side
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+from collections import Counter
+
+import httpx
+
+WORDS = ['calm', 'happy', 'tired', 'stressed', 'grateful', 'work', 'family', 'walk', 'sleep',
+         'anxious', 'not', 'very', 'good', 'bad', 'today', 'friend', 'rain', 'sun', 'coffee']
+
+def random_text(rng, length):
+    """Unique text so the sentiment cache does not short-circuit the work"""
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    return ' '.join(words) + f' {rng.random()}'
+
+async def login(client, username, password):
+    """Log in the way a browser does, returning the CSRF token for later requests"""
+    page = await client.get('/login')
+    match = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page.text)
+    token = match.group(1) if match else ''
+    response = await client.post('/api/login', json={'username': username, 'password': password},
+                                 headers={'X-CSRFToken': token})
+    response.raise_for_status()
+    return token
+
+def make_request(endpoint, token, rng, length):
+    """Return (method, path, keyword arguments) for one request to `endpoint`"""
+    headers = {'X-CSRFToken': token}
+    if endpoint == 'user':
+        return 'GET', '/api/user', {}
+    if endpoint == 'sentiment':
+        return 'POST', '/api/analyze-sentiment', {'json': {'text': random_text(rng, length)}, 'headers': headers}
+    return 'POST', '/api/entries', {
+        'json': {'mood': rng.choice(['Happy', 'Neutral', 'Sad']), 'journal_entry': random_text(rng, length)},
+        'headers': headers
+    }
+
+async def run(url, args):
+    """Fire `args.requests` requests at `url` from `args.concurrency` concurrent connections"""
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        token = await login(client, args.username, args.password)
+        rng = random.Random(42)
+        remaining = args.requests
+        latencies = []
+        statuses = Counter()
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                method, path, kwargs = make_request(args.endpoint, token, rng, args.length)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, **kwargs)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    ok = sum(count for status, count in statuses.items() if isinstance(status, int) and status < 400)
+    failures = ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str)
+                         if not (isinstance(status, int) and status < 400)) or 'none'
+    print(f"{url:<28} {ok / elapsed:>9.0f} ok req/s  p50 {percentile(0.5):>7.1f} ms  "
+          f"p95 {percentile(0.95):>7.1f} ms  p99 {percentile(0.99):>7.1f} ms  failures: {failures}")
+
+def main():
+    """Main function to run the benchmark"""
+    parser = argparse.ArgumentParser(description='Compare the sync and async API under concurrent load')
+    parser.add_argument('--url', action='append', required=True, help='Base URL to test (repeatable)')
+    parser.add_argument('--endpoint', choices=['user', 'sentiment', 'entries'], default='user',
+                        help='API endpoint to load')
+    parser.add_argument('--concurrency', type=int, default=500, help='Concurrent connections')
+    parser.add_argument('--requests', type=int, default=10000, help='Requests per URL')
+    parser.add_argument('--length', type=int, default=1000, help='Characters of text per request')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+    parser.add_argument('--username', default='admin', help='Account to log in as')
+    parser.add_argument('--password', default='adminpassword', help='Password for the account')
+    args = parser.parse_args()
+
+    print(f"{args.requests} {args.endpoint} requests with {args.concurrency} concurrent connections")
+    for url in args.url:
+        asyncio.run(run(url, args))
+
+if __name__ == "__main__":
+    main()
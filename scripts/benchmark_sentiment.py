@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Script to benchmark sentiment scoring throughput on 5000-character journal entries
+Compares the single-pass automaton scorer with rescanning the text once per lexicon phrase
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.scorer import SentimentScorer, DEFAULT_LEXICON_PATH, tokenize
+
+FILLER_WORDS = ['today', 'i', 'went', 'to', 'the', 'park', 'with', 'my', 'friend', 'and', 'we',
+                'talked', 'about', 'work', 'family', 'weekend', 'plans', 'it', 'was', 'a', 'day']
+
+def make_entries(lexicon, count, length, seed=42):
+    """Build `count` entries of about `length` characters mixing filler and lexicon phrases"""
+    rng = random.Random(seed)
+    phrases = list(lexicon['terms']) + lexicon['negators'] + list(lexicon['intensifiers'])
+    entries = []
+    for _ in range(count):
+        parts = []
+        size = 0
+        while size < length:
+            word = rng.choice(phrases) if rng.random() < 0.15 else rng.choice(FILLER_WORDS)
+            if rng.random() < 0.08:
+                word += '.'
+            parts.append(word)
+            size += len(word) + 1
+        entries.append(' '.join(parts)[:length])
+    return entries
+
+def naive_scan(lexicon, text):
+    """Reference approach: rescan the normalized text once for every lexicon phrase"""
+    normalized = ' ' + ' '.join(tokenize(text)) + ' '
+    total = 0.0
+    for phrase, weight in lexicon['terms'].items():
+        total += normalized.count(' ' + ' '.join(tokenize(phrase)) + ' ') * weight
+    return total
+
+def measure(label, func, entries, repeat):
+    """Time `func` over every entry, keeping the best of `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in entries:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+
+    size_mb = sum(len(text) for text in entries) / 1e6
+    print(f"{label:<24} {len(entries) / best:>10.0f} entries/s {size_mb / best:>8.2f} MB/s")
+
+def main():
+    """Main function to run the benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmark sentiment scoring throughput')
+    parser.add_argument('--lexicon', default=DEFAULT_LEXICON_PATH, help='Lexicon file to compile')
+    parser.add_argument('--entries', type=int, default=500, help='Entries per run')
+    parser.add_argument('--length', type=int, default=5000, help='Characters per entry')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs to take the best of')
+    args = parser.parse_args()
+
+    with open(args.lexicon, encoding='utf-8') as f:
+        lexicon = json.load(f)
+
+    started = time.perf_counter()
+    scorer = SentimentScorer(lexicon)
+    compile_ms = (time.perf_counter() - started) * 1000
+    print(f"Compiled {len(scorer.automaton.goto)} automaton states in {compile_ms:.1f} ms")
+
+    entries = make_entries(lexicon, args.entries, args.length)
+    measure('automaton scorer', scorer.score, entries, args.repeat)
+    measure('per-phrase rescan', lambda text: naive_scan(lexicon, text), entries, args.repeat)
+
+if __name__ == "__main__":
+    main()
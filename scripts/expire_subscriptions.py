@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Script to expire finished trials and lapsed subscriptions
+Intended to be run on a schedule (e.g. every few minutes from cron) alongside live traffic
+"""
+import os
+import sys
+import argparse
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.sweeper import run_sweep, DEFAULT_CHUNK_SIZE
+
+def main():
+    """Main function to run the expiry sweep"""
+    parser = argparse.ArgumentParser(description='Expire trials and lapsed subscriptions')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Rows updated per transaction')
+    parser.add_argument('--pause', type=float, default=0,
+                        help='Seconds to sleep between chunks')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        counts = run_sweep(chunk_size=args.chunk_size, pause=args.pause)
+
+    print(f"Trials expired: {counts['trials_expired']}")
+    print(f"Subscriptions lapsed: {counts['subscriptions_lapsed']}")
+    print(f"Users unsubscribed: {counts['users_unsubscribed']}")
+    print(f"Revoked tokens purged: {counts['tokens_purged']}")
+    print(f"Entry changes pruned: {counts['changes_pruned']}")
+
+if __name__ == "__main__":
+    main()
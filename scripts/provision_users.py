@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Script to create user accounts in bulk from a CSV or JSON Lines file
+Each row needs username, email and password, and may set name, plan
+(monthly or annual, which starts an active subscription) and trial_days.
+Rows that cannot be created are listed in an error report; the rest are
+created regardless
+"""
+import os
+import sys
+import argparse
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.provisioning import provision_stream, DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE
+
+def main():
+    """Main function to provision users"""
+    parser = argparse.ArgumentParser(description='Create user accounts in bulk')
+    parser.add_argument('input', help="CSV or JSON Lines file of accounts ('-' for stdin)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help='Input format (default: from the file extension, else csv)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Accounts checked and inserted per transaction')
+    parser.add_argument('--workers', type=int, help='Password hashing processes (default: one per core)')
+    parser.add_argument('--errors', help='Write the per-row error report to this CSV file')
+    parser.add_argument('--dry-run', action='store_true', help='Validate and check uniqueness without creating anything')
+    args = parser.parse_args()
+    if not 1 <= args.batch_size <= MAX_BATCH_SIZE:
+        parser.error(f'--batch-size must be between 1 and {MAX_BATCH_SIZE}')
+
+    format = args.format or ('jsonl' if args.input.endswith(('.jsonl', '.ndjson')) else 'csv')
+    started = time.time()
+
+    def progress(processed, report):
+        rate = processed / max(time.time() - started, 1e-6)
+        print(f"{processed} rows read, {report.created} created, {len(report.errors)} failed ({rate:.0f} rows/s)")
+
+    app = create_app()
+    with app.app_context():
+        if args.input == '-':
+            report = provision_stream(sys.stdin, format, args.batch_size, args.workers, args.dry_run,
+                                      progress=progress)
+        else:
+            with open(args.input, newline='', encoding='utf-8-sig') as f:
+                report = provision_stream(f, format, args.batch_size, args.workers, args.dry_run,
+                                          progress=progress)
+
+    verb = 'Would create' if args.dry_run else 'Created'
+    print(f"{verb} {report.created} accounts in {time.time() - started:.1f}s, {len(report.errors)} rows failed")
+
+    if report.errors:
+        if args.errors:
+            with open(args.errors, 'w', newline='') as f:
+                report.write_errors(f)
+            print(f"Error report written to {args.errors}")
+        else:
+            for error in report.errors[:20]:
+                print(f"  line {error['line']}: {error['username']}: {error['error']}")
+            if len(report.errors) > 20:
+                print(f"  ... and {len(report.errors) - 20} more (use --errors to save them all)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Script to recompute stored journal entry sentiment after the lexicon changes
+Progress is checkpointed after every chunk; rerun the same command to resume
+"""
+import os
+import sys
+import argparse
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.rescore import rescore_entries, DEFAULT_CHUNK_SIZE
+from app.utils import sentiment_version
+
+def main():
+    """Main function to rescore entries"""
+    parser = argparse.ArgumentParser(description='Rescore journal entry sentiment')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Entries read and written per batch')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Scoring processes (defaults to the CPU count)')
+    parser.add_argument('--checkpoint', default='rescore_checkpoint.json',
+                        help='File used to resume an interrupted run')
+    parser.add_argument('--max-rows-per-second', type=float, default=None,
+                        help='Upper bound on the rescoring rate')
+    parser.add_argument('--pause', type=float, default=0,
+                        help='Seconds to sleep between chunks')
+    args = parser.parse_args()
+
+    def progress(last_id, updated):
+        print(f"Rescored up to entry {last_id} ({updated} updated)")
+
+    app = create_app()
+    with app.app_context():
+        print(f"Rescoring entries with sentiment version {sentiment_version()}...")
+        try:
+            updated = rescore_entries(
+                chunk_size=args.chunk_size,
+                workers=args.workers,
+                checkpoint_path=args.checkpoint,
+                max_rows_per_second=args.max_rows_per_second,
+                pause=args.pause,
+                progress=progress
+            )
+        except KeyboardInterrupt:
+            print("Interrupted; rerun the same command to resume from the checkpoint.")
+            sys.exit(1)
+
+    print(f"Rescoring complete! {updated} entries updated.")
+
+if __name__ == "__main__":
+    main()
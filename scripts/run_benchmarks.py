@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Script to run the microbenchmark suite and compare it with the stored baseline
+    python scripts/run_benchmarks.py                  # run and compare with benchmarks/baseline.json
+    python scripts/run_benchmarks.py --save-baseline  # run and replace the baseline
+    python scripts/run_benchmarks.py --output run.json --only render
+Exits with status 1 when any case regressed, so it can gate a release
+"""
+import os
+import sys
+import json
+import argparse
+
+# Add parent directory to path to import app and benchmark modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.suite import (BASELINE_PATH, BASELINE_FORMAT, create_benchmark_app, build_cases,
+                              run, compare, format_time)
+
+def print_result(name, result):
+    print(f"{name:<28} median {format_time(result['median']):>10}  "
+          f"stdev {result['stdev'] / result['median'] * 100:>5.1f}%  ({result['loops']} calls/sample)")
+
+def main():
+    """Main function to run the benchmarks"""
+    parser = argparse.ArgumentParser(description='Run the microbenchmarks and compare them with a baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline results file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Write this run to the baseline file instead of comparing')
+    parser.add_argument('--input', help='Compare an earlier run saved with --output instead of running')
+    parser.add_argument('--output', help='Also save this run to a file')
+    parser.add_argument('--only', action='append', help='Run only cases whose names start with this (repeatable)')
+    parser.add_argument('--samples', type=int, default=20, help='Timed samples per case')
+    parser.add_argument('--min-time', type=float, default=0.05, help='Minimum seconds per sample')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Slowdown of the median (0.10 = 10%%) needed to report a regression')
+    parser.add_argument('--alpha', type=float, default=0.01,
+                        help='Significance level of the Mann-Whitney U test')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            current = json.load(f)
+    else:
+        app = create_benchmark_app()
+        with app.app_context():
+            current = run(build_cases(app), samples=args.samples, min_time=args.min_time,
+                          only=args.only, progress=print_result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+        print(f"Saved {len(current['results'])} results to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; create one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('format') != BASELINE_FORMAT:
+        sys.exit(f"Unsupported baseline format {baseline.get('format')}")
+
+    if baseline['environment'] != current['environment']:
+        print("Warning: the baseline was recorded in a different environment:")
+        for key, value in baseline['environment'].items():
+            if current['environment'].get(key) != value:
+                print(f"  {key}: {value} (now {current['environment'].get(key)})")
+
+    rows = compare(baseline, current, threshold=args.threshold, alpha=args.alpha)
+    print()
+    print(f"{'case':<28} {'baseline':>10} {'current':>10} {'change':>8} {'p-value':>8}  verdict")
+    for name, before, after, ratio, p_value, verdict in rows:
+        print(f"{name:<28} {format_time(before):>10} {format_time(after):>10} "
+              f"{(ratio - 1) * 100:>+7.1f}% {p_value:>8.4f}  {verdict}")
+
+    missing = sorted(set(current['results']) - set(baseline['results']))
+    if missing:
+        print(f"Not in the baseline: {', '.join(missing)}")
+
+    regressions = [row[0] for row in rows if row[5] == 'regression']
+    if regressions:
+        sys.exit(f"Regressions: {', '.join(regressions)}")
+    print("No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Script to export new journal entries into the columnar analytics snapshot
+Intended to run as a periodic background job; each run appends only the
+entries created since the previous one. Use --rebuild to start over, e.g.
+after bulk edits or deletions
+"""
+import os
+import sys
+import argparse
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.analytics import export_entries, rebuild, snapshot_dir
+
+def main():
+    """Main function to update the analytics snapshot"""
+    parser = argparse.ArgumentParser(description='Export journal entries for population analytics')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Discard the snapshot and export every entry again')
+    parser.add_argument('--batch-size', type=int, default=50000,
+                        help='Entries read and appended per batch')
+    parser.add_argument('--lag', type=int, default=300,
+                        help='Leave entries younger than this many seconds for the next run')
+    args = parser.parse_args()
+
+    def progress(appended, watermark):
+        print(f"Exported {appended} entries (up to id {watermark})")
+
+    app = create_app()
+    with app.app_context():
+        print(f"Updating analytics snapshot in {snapshot_dir()}...")
+        export = rebuild if args.rebuild else export_entries
+        appended = export(batch_size=args.batch_size, lag=args.lag, progress=progress)
+
+    print(f"Snapshot complete! {appended} entries exported.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Shared fixtures for the Serene application's tests
+Each test gets a fresh app on its own SQLite database file
+"""
+import pytest
+
+from app import create_app, db
+from app.models.user import User
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Session files stay inside the test's directory; Flask-Session fixes its
+    # default directory when it is imported
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('flask_session.defaults.Defaults.SESSION_FILE_DIR', str(tmp_path / 'flask_session'))
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'serene.db'}")
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(username='tester', email='tester@example.com')
+        user.password = 'password123'
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+@pytest.fixture
+def client(app, user):
+    """Test client logged in as `user`"""
+    client = app.test_client()
+    response = client.post('/api/login', json={'username': 'tester', 'password': 'password123'})
+    assert response.status_code == 200
+    return client
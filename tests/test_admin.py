@@ -0,0 +1,19 @@
+"""
+Tests for the admin routes
+"""
+import pytest
+
+CSV = 'username,email,password\n' + ''.join(
+    f'user{i},user{i}@example.com,password{i}pass\n' for i in range(3))
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setenv('ADMIN_USERNAMES', 'tester')
+
+def test_provision_api_stops_at_row_limit(admin, app, client):
+    app.config['PROVISION_API_MAX_ROWS'] = 2
+    response = client.post('/api/admin/users/provision?dry_run=1', data=CSV, content_type='text/csv')
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['truncated']
+    assert report['failed'] == 0
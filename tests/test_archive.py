@@ -0,0 +1,67 @@
+"""
+Tests for cold-data archival
+"""
+from datetime import datetime, timedelta
+
+from app import db
+from app.archive import archive_entries
+from app.models.entry import Entry
+
+def _archive_old_entry(app, user_id):
+    with app.app_context():
+        entry = Entry(user_id=user_id, date=datetime.utcnow() - timedelta(days=400),
+                      mood='Sad', journal_entry='An old entry')
+        db.session.add(entry)
+        db.session.commit()
+        archived_id = entry.id
+        assert archive_entries(days=180) == 1
+    return archived_id
+
+def test_archived_ids_are_not_reused(app, user, client):
+    archived_id = _archive_old_entry(app, user)
+
+    response = client.post('/api/sync', json={'changes': [
+        {'op': 'create', 'mood': 'Happy', 'journal_entry': 'A new entry'}
+    ]})
+    new_id = response.get_json()['results'][0]['entry']['id']
+    assert new_id > archived_id
+
+    ids = [entry['id'] for entry in client.get('/api/entries?start=2000-01-01').get_json()]
+    assert sorted(ids) == sorted({archived_id, new_id})
+
+def test_sync_delete_of_archived_entry_leaves_new_entry(app, user, client):
+    archived_id = _archive_old_entry(app, user)
+    client.post('/api/sync', json={'changes': [
+        {'op': 'create', 'mood': 'Happy', 'journal_entry': 'A new entry'}
+    ]})
+
+    entries = client.get('/api/entries?start=2000-01-01').get_json()
+    base_seq = next(entry['change_seq'] for entry in entries if entry['id'] == archived_id)
+
+    response = client.post('/api/sync', json={'changes': [
+        {'op': 'delete', 'id': archived_id, 'base_seq': base_seq}
+    ]})
+    assert response.get_json()['results'][0]['status'] == 'applied'
+
+    entries = client.get('/api/entries?start=2000-01-01').get_json()
+    assert [entry['journal_entry'] for entry in entries] == ['A new entry']
+
+def test_mood_counts_include_archived_entries(app, user):
+    from app.archive import count_moods, restore_entry
+    from app.models.entry_archive import EntryArchive
+
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=400)
+        entries = [Entry(user_id=user, date=old, mood=mood, journal_entry='Old') for mood in ('Sad', 'Sad', 'Happy')]
+        db.session.add_all(entries + [Entry(user_id=user, mood='Happy', journal_entry='New')])
+        db.session.commit()
+        sad_id = entries[0].id
+        assert archive_entries(days=180) == 3
+
+        assert EntryArchive.query.one().mood_counts == {'Sad': 2, 'Happy': 1}
+        assert count_moods(user) == {'Sad': 2, 'Happy': 2}
+
+        restore_entry(sad_id, user)
+        db.session.commit()
+        assert EntryArchive.query.one().mood_counts == {'Sad': 1, 'Happy': 1}
+        assert count_moods(user) == {'Sad': 2, 'Happy': 2}
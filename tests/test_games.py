@@ -0,0 +1,18 @@
+"""
+Tests for the games and activities routes
+"""
+import pytest
+
+@pytest.mark.parametrize('body', [[{'activity': 'breathing'}], 'events', 5])
+def test_activity_events_rejects_non_object_body(client, body):
+    response = client.post('/api/activity-events', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Missing events'
+
+def test_activity_events_reports_rejected_events(client):
+    response = client.post('/api/activity-events', json={'events': ['not an event']})
+    assert response.status_code == 202
+    assert response.get_json() == {
+        'accepted': 0,
+        'rejected': [{'index': 0, 'error': 'Event must be an object'}]
+    }
@@ -0,0 +1,22 @@
+"""
+Tests for admission control behind reverse proxies
+"""
+import pytest
+
+PROXY = {'REMOTE_ADDR': '10.0.0.5'}
+
+@pytest.fixture
+def behind_proxy(monkeypatch):
+    monkeypatch.setenv('TRUSTED_PROXIES', '1')
+
+def test_metrics_trusts_forwarded_address_behind_proxy(behind_proxy, app):
+    client = app.test_client()
+    response = client.get('/metrics', environ_base=PROXY, headers={'X-Forwarded-For': '127.0.0.1'})
+    assert response.status_code == 200
+    response = client.get('/metrics', environ_base=PROXY, headers={'X-Forwarded-For': '203.0.113.7'})
+    assert response.status_code == 403
+
+def test_metrics_ignores_forwarded_address_without_trusted_proxies(app):
+    client = app.test_client()
+    response = client.get('/metrics', environ_base=PROXY, headers={'X-Forwarded-For': '127.0.0.1'})
+    assert response.status_code == 403
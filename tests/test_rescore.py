@@ -0,0 +1,29 @@
+"""
+Tests for bulk sentiment re-scoring
+"""
+from app import db
+from app.models.entry import Entry
+from app.rescore import rescore_entries
+from app.utils import sentiment_version
+
+def test_rescored_entries_reach_delta_sync(app, user, client):
+    with app.app_context():
+        db.session.add_all([
+            Entry(user_id=user, mood='Happy', journal_entry='I am so happy today',
+                  sentiment='Negative', sentiment_version='old'),
+            Entry(user_id=user, mood='Sad', journal_entry='Supplied by the client',
+                  sentiment='Positive', sentiment_version=None),
+        ])
+        db.session.commit()
+
+    token = client.get('/api/sync').get_json()['next']
+
+    with app.app_context():
+        assert rescore_entries(workers=1) == 1
+
+    changes = client.get(f'/api/sync?since={token}').get_json()['changes']
+    assert len(changes) == 1
+    entry = changes[0]['entry']
+    assert entry['journal_entry'] == 'I am so happy today'
+    assert entry['sentiment'] == 'Positive'
+    assert entry['sentiment_version'] == sentiment_version()
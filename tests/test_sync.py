@@ -0,0 +1,22 @@
+"""
+Tests for the delta sync routes
+"""
+import pytest
+
+from app.routes.sync import MAX_PAGE_SIZE
+
+@pytest.mark.parametrize('limit', [0, -1, MAX_PAGE_SIZE + 1])
+def test_sync_rejects_out_of_range_limit(client, limit):
+    response = client.get(f'/api/sync?limit={limit}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'limit must be between 1 and {MAX_PAGE_SIZE}'
+
+def test_sync_pages_with_limit(client):
+    for text in ('First entry', 'Second entry'):
+        assert client.post('/api/entries', json={'mood': 'Calm', 'journal_entry': text}).status_code == 201
+
+    page = client.get('/api/sync?limit=1').get_json()
+    assert len(page['changes']) == 1 and page['has_more']
+
+    page = client.get(f"/api/sync?limit=1&since={page['next']}").get_json()
+    assert len(page['changes']) == 1 and not page['has_more']